@@ -424,7 +424,7 @@ with tab5:
         <li>🤖 <strong>Collecte automatique</strong> : L'application scanne Spotify et Deezer tous les jours</li>
         <li>📊 <strong>Analyse intelligente</strong> : Chaque artiste reçoit un score sur 100 points</li>
         <li>📈 <strong>Suivi dans le temps</strong> : On surveille l'évolution de leur popularité</li>
-        <li>🔔 <strong>Alertes</strong> : On vous prévient quand un artiste explose (+20% de followers)</li>
+        <li>🔔 <strong>Alertes</strong> : On vous prévient quand un artiste explose (+10% de followers ou hausse inhabituelle)</li>
         <li>🎯 <strong>Recommandations</strong> : On vous propose les meilleurs talents à signer</li>
     </ul>
     </div>
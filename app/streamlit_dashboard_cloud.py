@@ -2,17 +2,22 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
 import os
 from PIL import Image
 
 import auth  # ← AJOUT AUTHENTIFICATION
 
+# Modules partagés avec les scripts (pool de connexions)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
 # Détection de l'environnement
 try:
     import psycopg2
     from psycopg2.extras import RealDictCursor
+    import db_pool
+    import metrics_rollup
     USE_POSTGRES = True
     DB_URL = st.secrets["DATABASE_URL"]
 except:
@@ -190,80 +195,114 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_db_pool():
+    """Pool PostgreSQL partagé par toutes les sessions du dashboard"""
+    return db_pool.get_pool(DB_URL)
+
+# SQLite : pas de vue matérialisée, même résultat calculé à la volée
+SQLITE_LATEST_METRICS = """
+    SELECT * FROM (
+        SELECT m.*, a.nom as nom_artiste, a.url, a.plateforme as platform,
+               ROW_NUMBER() OVER (PARTITION BY m.artist_id, m.plateforme
+                                  ORDER BY m.date_collecte DESC, m.id DESC) as rn
+        FROM metriques_historique m
+        LEFT JOIN artistes a ON m.artist_id = a.artist_id AND m.plateforme = a.plateforme
+    ) WHERE rn = 1
+"""
+
+def read_tables(conn):
+    """Artistes, dernière mesure par artiste/plateforme et alertes non lues"""
+    artistes_df = pd.read_sql_query("SELECT * FROM artistes", conn)
+    
+    # Une ligne par artiste et plateforme (vue latest_metrics, rafraîchie après chaque collecte)
+    if USE_POSTGRES:
+        # Croissance 1/7/30 jours calculée après chaque collecte (growth_metrics.py)
+        latest_df = pd.read_sql_query("""
+            SELECT l.*, g.croissance_1j_pct, g.croissance_7j_pct, g.croissance_30j_pct
+            FROM latest_metrics l
+            LEFT JOIN growth_metrics g ON g.artist_key = l.artist_key
+        """, conn)
+        alertes_df = pd.read_sql_query(
+            "SELECT * FROM alertes WHERE vu = FALSE ORDER BY date_alerte DESC", conn
+        )
+    else:
+        latest_df = pd.read_sql_query(SQLITE_LATEST_METRICS, conn).drop(columns='rn')
+        alertes_df = pd.read_sql_query(
+            "SELECT * FROM alertes WHERE vu = 0 ORDER BY date_alerte DESC", conn
+        )
+    
+    latest_df['date_collecte'] = pd.to_datetime(latest_df['date_collecte'])
+    return artistes_df, latest_df, alertes_df
+
+# Périodes de l'onglet Évolution (jours, None = tout l'historique)
+HISTORY_PERIODS = {"3 mois": 90, "1 an": 365, "Tout": None}
+
+def read_artist_history(conn, nom_artiste, days=None):
+    """Historique d'un seul artiste (onglet Évolution)
+
+    PostgreSQL : mesures brutes sur 3 mois, agrégats hebdo/mensuels au-delà
+    (voir metrics_rollup.py). SQLite : mesures brutes.
+    """
+    if USE_POSTGRES:
+        return metrics_rollup.load_history(conn, nom_artiste, days)
+    
+    since = datetime.now() - timedelta(days=days) if days is not None else datetime(1970, 1, 1)
+    history_df = pd.read_sql_query("""
+        SELECT m.*, a.nom as nom_artiste, a.url, a.plateforme as platform
+        FROM metriques_historique m
+        JOIN artistes a ON m.artist_id = a.artist_id AND m.plateforme = a.plateforme
+        WHERE a.nom = ? AND m.date_collecte >= ?
+        ORDER BY m.date_collecte
+    """, conn, params=(nom_artiste, since.strftime('%Y-%m-%d %H:%M:%S')))
+    history_df['score_potentiel'] = pd.to_numeric(history_df['score_potentiel'], errors='coerce')
+    return history_df
+
+def query(reader, *args):
+    """Exécute `reader(conn, *args)` sur une connexion du pool (ou SQLite)"""
+    if USE_POSTGRES:
+        with get_db_pool().connection() as conn:
+            return reader(conn, *args)
+    
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        return reader(conn, *args)
+    finally:
+        conn.close()
+
 @st.cache_data(ttl=300)
 def load_data():
-    """Charge les données depuis PostgreSQL ou SQLite"""
+    """Charge les données depuis PostgreSQL (connexion du pool) ou SQLite"""
     try:
-        if USE_POSTGRES:
-            conn = psycopg2.connect(DB_URL)
-        else:
-            conn = sqlite3.connect(DB_NAME)
-        
-        artistes_df = pd.read_sql_query("SELECT * FROM artistes", conn)
-        
-        # Requête SQL simplifiée (compatible PostgreSQL et SQLite)
-        metriques_df = pd.read_sql_query("""
-            SELECT m.*, a.nom as nom_artiste, a.url, a.plateforme as platform
-            FROM metriques_historique m
-            LEFT JOIN artistes a ON m.artist_id = a.artist_id AND m.plateforme = a.plateforme
-            ORDER BY m.date_collecte DESC
-        """, conn)
-        
-        # Requête alertes adaptative
-        if USE_POSTGRES:
-            alertes_df = pd.read_sql_query(
-                "SELECT * FROM alertes WHERE vu = FALSE ORDER BY date_alerte DESC", conn
-            )
-        else:
-            alertes_df = pd.read_sql_query(
-                "SELECT * FROM alertes WHERE vu = 0 ORDER BY date_alerte DESC", conn
-            )
-        
-        conn.close()
-        return artistes_df, metriques_df, alertes_df
-        
+        return query(read_tables)
     except Exception as e:
         st.error(f"❌ Erreur chargement données: {e}")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-def get_latest_metrics(metriques_df):
-    """Récupère les dernières métriques par artiste/plateforme"""
-    if metriques_df.empty:
-        return pd.DataFrame()
-    
+@st.cache_data(ttl=300)
+def load_artist_history(nom_artiste, days=None):
     try:
-        # Conversion date
-        metriques_df['date_collecte'] = pd.to_datetime(metriques_df['date_collecte'])
-        
-        # Grouper par artist_id et plateforme, garder la plus récente
-        latest = metriques_df.sort_values('date_collecte', ascending=False) \
-                             .groupby(['artist_id', 'plateforme']) \
-                             .first() \
-                             .reset_index()
-        return latest
+        return query(read_artist_history, nom_artiste, days)
     except Exception as e:
-        st.error(f"Erreur traitement métriques: {e}")
+        st.error(f"Erreur chargement historique: {e}")
         return pd.DataFrame()
 
 # ==================== CHARGEMENT DONNÉES ====================
 try:
-    artistes_df, metriques_df, alertes_df = load_data()
+    artistes_df, latest_metrics_df, alertes_df = load_data()
     
     # Vérifications robustes
-    if artistes_df.empty or metriques_df.empty:
+    if artistes_df.empty:
         st.error(" Base de données vide ou inaccessible")
         st.info(" Importez vos données avec le script `database_postgres.py`")
         st.stop()
     
-    latest_metrics_df = get_latest_metrics(metriques_df)
-    
     if latest_metrics_df.empty:
         st.error(" Aucune métrique trouvée")
         st.stop()
     
     # Conversion scores en numérique
     latest_metrics_df['score_potentiel'] = pd.to_numeric(latest_metrics_df['score_potentiel'], errors='coerce')
-    metriques_df['score_potentiel'] = pd.to_numeric(metriques_df['score_potentiel'], errors='coerce')
     
 except Exception as e:
     st.error(f" Erreur critique: {e}")
@@ -312,6 +351,10 @@ filtered_df = filtered_df[
 
 st.sidebar.write(f"**{len(filtered_df)} artistes** après filtrage")
 
+if USE_POSTGRES:
+    with st.sidebar.expander("🐘 Connexions PostgreSQL"):
+        st.json(get_db_pool().stats)
+
 # ==================== TABS ====================
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "**📊 VUE D'ENSEMBLE**", 
@@ -453,6 +496,10 @@ with tab2:
         # Tableau des données
         display_df = top_df[['nom_artiste', 'plateforme', 'followers_total', 'score_potentiel', 'url']].copy()
         
+        # Croissance sur 7 jours (PostgreSQL uniquement)
+        if 'croissance_7j_pct' in top_df.columns:
+            display_df.insert(3, 'croissance_7j_pct', pd.to_numeric(top_df['croissance_7j_pct'], errors='coerce'))
+        
         # Ajouter colonne "Écouter" (même URL que profil)
         display_df['Écouter'] = display_df['url']
         
@@ -460,7 +507,10 @@ with tab2:
         display_df = display_df.drop(columns=['url'])
         
         # Renommer les colonnes
-        display_df.columns = ['Nom', 'Plateforme', 'Followers/Fans', 'Score', '🎵 Écouter']
+        display_df = display_df.rename(columns={
+            'nom_artiste': 'Nom', 'plateforme': 'Plateforme', 'followers_total': 'Followers/Fans',
+            'croissance_7j_pct': '📈 7 jours (%)', 'score_potentiel': 'Score', 'Écouter': '🎵 Écouter',
+        })
         
         # Formater
         display_df['Followers/Fans'] = display_df['Followers/Fans'].apply(lambda x: f"{int(x):,}")
@@ -482,14 +532,19 @@ with tab2:
 with tab3:
     st.markdown("### 📈 Évolution Temporelle")
     
-    if len(metriques_df) > 0 and 'nom_artiste' in metriques_df.columns:
-        artistes_list = sorted(metriques_df['nom_artiste'].dropna().unique())
+    if len(latest_metrics_df) > 0 and 'nom_artiste' in latest_metrics_df.columns:
+        artistes_list = sorted(latest_metrics_df['nom_artiste'].dropna().unique())
         
         if len(artistes_list) > 0:
-            selected_artist = st.selectbox("Artiste", artistes_list)
+            col_artist, col_period = st.columns([3, 1])
+            with col_artist:
+                selected_artist = st.selectbox("Artiste", artistes_list)
+            with col_period:
+                period = st.selectbox("Période", list(HISTORY_PERIODS))
             
             if selected_artist:
-                artist_data = metriques_df[metriques_df['nom_artiste'] == selected_artist].copy()
+                # Historique chargé pour l'artiste choisi uniquement
+                artist_data = load_artist_history(selected_artist, HISTORY_PERIODS[period]).copy()
                 
                 if not artist_data.empty:
                     # Préparation des données
@@ -511,7 +566,14 @@ with tab3:
                     with col2:
                         st.metric("⭐ Score Actuel", f"{latest['score_potentiel']:.1f}")
                     with col3:
-                        if len(artist_data) > 1:
+                        # PostgreSQL : croissance 7/30 jours de growth_metrics ; sinon sur la période
+                        growth_row = latest_metrics_df[latest_metrics_df['nom_artiste'] == selected_artist]
+                        growth_30j = pd.to_numeric(growth_row.get('croissance_30j_pct', pd.Series(dtype=float)), errors='coerce').dropna()
+                        growth_7j = pd.to_numeric(growth_row.get('croissance_7j_pct', pd.Series(dtype=float)), errors='coerce').dropna()
+                        if not growth_30j.empty:
+                            st.metric("📈 Croissance 30 j", f"{growth_30j.iloc[0]:.1f}%",
+                                      delta=f"{growth_7j.iloc[0]:.1f}% sur 7 j" if not growth_7j.empty else None)
+                        elif len(artist_data) > 1:
                             first_f = artist_data.iloc[0]['followers_chart']
                             if first_f > 0:
                                 growth = ((followers - first_f) / first_f) * 100
@@ -645,7 +707,7 @@ with tab5:
         <li>🤖 <strong>Collecte automatique</strong> : L'application scanne Spotify et Deezer tous les jours</li>
         <li>📊 <strong>Analyse intelligente</strong> : Chaque artiste reçoit un score sur 100 points</li>
         <li>📈 <strong>Suivi dans le temps</strong> : On surveille l'évolution de leur popularité</li>
-        <li>🔔 <strong>Alertes</strong> : On vous prévient quand un artiste explose (+20% de followers)</li>
+        <li>🔔 <strong>Alertes</strong> : On vous prévient quand un artiste explose (+10% de followers ou hausse inhabituelle)</li>
         <li>🎯 <strong>Recommandations</strong> : On vous propose les meilleurs talents à signer</li>
     </ul>
     </div>
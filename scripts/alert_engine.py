@@ -0,0 +1,336 @@
+"""
+Moteur d'alertes commun (PostgreSQL et SQLite)
+Les règles sont déclaratives (RULES) et compilées en une seule requête, la
+même sur les deux bases au dialecte près :
+- règle à `fenetre` (1, 7 ou 30 jours) : référence « N jours avant » calculée
+  par growth_metrics.baseline_sql(), la définition de la table growth_metrics
+  affichée par le dashboard ;
+- règle sans `fenetre` : mesure précédente du même artiste, avec LAG().
+Les hausses inhabituelles (anomaly_detection) complètent les règles à seuil.
+Les alertes sont écrites en un lot, avec la même clé de délai de carence sur
+les deux bases (COOLDOWN_CLAUSE).
+
+Utilisé par detect_alerts.py (workflow GitHub, PostgreSQL) et par
+auto_scheduler.py (base SQLite locale).
+"""
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+
+import anomaly_detection
+from growth_metrics import LOOKBACK_DAYS, baseline_sql
+
+# Mesures comparables (expressions sur metriques_historique m)
+METRICS = {
+    'abonnes': 'COALESCE(m.followers, m.fans)',
+    'score': 'm.score_potentiel',
+}
+
+# mode 'pourcentage' : variation relative ; 'points' : différence
+# fenetre : variation sur 1, 7 ou 30 jours (growth_metrics.WINDOWS) ; sans : depuis la mesure précédente
+# palier : largeur des paliers de variation (empreinte et délai de carence)
+RULES = [
+    {
+        'type': 'croissance_followers', 'mesure': 'abonnes', 'mode': 'pourcentage',
+        'fenetre': 1, 'seuil': 10, 'palier': 10,
+        'message': "📈 Croissance de {variation:.1f}% ({precedent:,.0f} → {valeur:,.0f})",
+    },
+    {
+        'type': 'amelioration_score', 'mesure': 'score', 'mode': 'points',
+        'seuil': 10, 'palier': 10,
+        'message': "🎯 Score en hausse de {variation:.1f} points ({precedent:.1f} → {valeur:.1f})",
+    },
+]
+
+ANOMALY_TYPE = 'anomalie_croissance'
+ANOMALY_MESSAGE = ("⚡ Hausse inhabituelle de {variation:.1f}% ({precedent:,} → {valeur:,}), "
+                   "{z_score:.1f} écarts robustes au-dessus de sa tendance")
+ANOMALY_BUCKET = 10
+
+# Alertes retenues par type et par passage (les plus fortes variations)
+MAX_ALERTS_PER_RULE = 20
+
+# Historique lu : couvre la plus grande fenêtre et sa tolérance
+HISTORY_DAYS = LOOKBACK_DAYS
+
+# Une alerte n'est pas répétée pendant ce délai, sauf si elle change de palier
+COOLDOWN_DAYS = 7
+
+# Clé du délai de carence, commune aux deux bases (valeurs selon le dialecte)
+COOLDOWN_CLAUSE = """
+    NOT EXISTS (
+        SELECT 1 FROM alertes a
+        WHERE a.artist_id = {artist_id}
+        AND a.plateforme = {plateforme}
+        AND a.type_alerte = {type_alerte}
+        AND a.palier >= {palier}
+        AND a.date_alerte > {depuis}
+    )
+"""
+
+
+def alert_fingerprint(artist_id, plateforme, type_alerte, fenetre, palier):
+    """Empreinte déterministe : la même alerte détectée deux fois n'est enregistrée qu'une fois
+
+    `fenetre` : jour de collecte de la mesure qui déclenche l'alerte.
+    """
+    key = f"{artist_id}|{plateforme}|{type_alerte}|{fenetre}|{palier}"
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def _prepare_postgres(cursor):
+    import database_postgres as db
+    db.create_alerts_table(cursor)
+
+
+def _write_postgres(cursor, alerts):
+    """Une requête ; ignorées : même empreinte, ou délai de carence (COOLDOWN_CLAUSE)"""
+    from psycopg2.extras import execute_values
+
+    cooldown = COOLDOWN_CLAUSE.format(
+        artist_id='v.artist_id', plateforme='v.plateforme::plateforme_code',
+        type_alerte='v.type_alerte', palier='v.palier::smallint',
+        depuis=f"NOW() - INTERVAL '{COOLDOWN_DAYS} days'",
+    )
+    inserted = execute_values(cursor, f"""
+        INSERT INTO alertes (artist_id, plateforme, nom_artiste, type_alerte, message, palier, fingerprint, vu)
+        SELECT v.artist_id, v.plateforme::plateforme_code, v.nom, v.type_alerte, v.message,
+               v.palier::smallint, v.fingerprint, FALSE
+        FROM (VALUES %s) AS v (artist_id, plateforme, nom, type_alerte, message, palier, fingerprint)
+        WHERE {cooldown}
+        ON CONFLICT (fingerprint) DO NOTHING
+        RETURNING id
+    """, alerts, fetch=True)
+    return len(inserted)
+
+
+def _prepare_sqlite(cursor):
+    """Colonnes plateforme / palier / empreinte, ajoutées à une base existante"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(alertes)")}
+    for column, sql_type in (('plateforme', 'TEXT'), ('palier', 'INTEGER'), ('fingerprint', 'TEXT')):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE alertes ADD COLUMN {column} {sql_type}")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_alertes_fingerprint ON alertes(fingerprint)")
+
+
+def _write_sqlite(cursor, alerts):
+    """Un executemany ; ignorées : même empreinte, ou délai de carence (COOLDOWN_CLAUSE)"""
+    now = datetime.now()
+    cooldown = COOLDOWN_CLAUSE.format(
+        artist_id=':artist_id', plateforme=':plateforme', type_alerte=':type_alerte',
+        palier=':palier', depuis=':depuis',
+    )
+    before = cursor.connection.total_changes
+    cursor.executemany(f"""
+        INSERT INTO alertes (artist_id, plateforme, nom_artiste, type_alerte, message, palier,
+                             fingerprint, date_alerte, vu)
+        SELECT :artist_id, :plateforme, :nom, :type_alerte, :message, :palier, :fingerprint, :date_alerte, 0
+        WHERE {cooldown}
+        ON CONFLICT (fingerprint) DO NOTHING
+    """, [
+        {'artist_id': artist_id, 'plateforme': plateforme, 'nom': nom, 'type_alerte': type_alerte,
+         'message': message, 'palier': palier, 'fingerprint': fingerprint,
+         'date_alerte': now.isoformat(' '), 'depuis': (now - timedelta(days=COOLDOWN_DAYS)).isoformat(' ')}
+        for artist_id, plateforme, nom, type_alerte, message, palier, fingerprint in alerts
+    ])
+    return cursor.connection.total_changes - before
+
+
+# Différences de schéma et de dialecte ; `cle` : identifiant entier de l'artiste
+BACKENDS = {
+    'postgres': {
+        'history': """
+            SELECT m.artist_key AS cle, a.artist_id, a.plateforme::text AS plateforme, a.nom,
+                   m.jour_collecte AS jour, m.date_collecte, {mesures}
+            FROM metriques_historique m
+            JOIN artistes a ON a.id = m.artist_key
+            WHERE m.jour_collecte >= %(debut)s
+        """,
+        # Seuls les artistes collectés depuis le dernier passage sont évalués
+        'recent': """
+            AND m.artist_key IN (
+                SELECT artist_key FROM metriques_historique
+                WHERE jour_collecte >= %(since)s::date AND date_collecte > %(since)s
+            )
+        """,
+        'series': anomaly_detection.SERIES_QUERY,
+        'series_recent': anomaly_detection.SERIES_RECENT,
+        'artists': """
+            SELECT id, artist_id, plateforme::text, nom FROM artistes WHERE id = ANY(%(cles)s)
+        """,
+        'keys': list,
+        'prepare': _prepare_postgres,
+        'write': _write_postgres,
+    },
+    'sqlite': {
+        'history': """
+            SELECT a.rowid AS cle, a.artist_id, a.plateforme, a.nom,
+                   date(m.date_collecte) AS jour, m.date_collecte, {mesures}
+            FROM metriques_historique m
+            JOIN artistes a ON a.artist_id = m.artist_id AND a.plateforme = m.plateforme
+            WHERE m.date_collecte >= :debut
+        """,
+        'recent': """
+            AND (m.artist_id, m.plateforme) IN (
+                SELECT artist_id, plateforme FROM metriques_historique WHERE date_collecte > :since
+            )
+        """,
+        # Plusieurs mesures par jour possibles : la plus récente est assignée en dernier
+        'series': """
+            SELECT a.rowid, CAST(julianday(date(m.date_collecte)) - julianday(:start) AS INTEGER),
+                   COALESCE(m.followers, m.fans)
+            FROM metriques_historique m
+            JOIN artistes a ON a.artist_id = m.artist_id AND a.plateforme = m.plateforme
+            WHERE m.date_collecte >= :start
+            AND COALESCE(m.followers, m.fans) IS NOT NULL
+            {recent}
+            ORDER BY m.date_collecte
+        """,
+        'series_recent': """
+            AND (m.artist_id, m.plateforme) IN (
+                SELECT artist_id, plateforme FROM metriques_historique WHERE date_collecte > :since
+            )
+        """,
+        'artists': """
+            SELECT rowid, artist_id, plateforme, nom FROM artistes
+            WHERE rowid IN (SELECT value FROM json_each(:cles))
+        """,
+        'keys': json.dumps,
+        'prepare': _prepare_sqlite,
+        'write': _write_sqlite,
+    },
+}
+
+
+def _reference_column(rule):
+    """Colonne de la valeur de référence d'une règle dans la CTE `mesures`"""
+    if 'fenetre' in rule:
+        return f"{rule['mesure']}_{rule['fenetre']}j"
+    return f"{rule['mesure']}_precedent"
+
+
+def compile_rules(backend, rules=RULES, incremental=False):
+    """Requête unique évaluant toutes les règles sur la dernière mesure de chaque artiste
+
+    Colonnes : cle, artist_id, plateforme, nom, jour, type_alerte, valeur,
+    precedent, variation ; triées par type puis variation décroissante.
+    """
+    dialect = BACKENDS[backend]
+    metrics = sorted({rule['mesure'] for rule in rules})
+
+    history = dialect['history'].format(
+        mesures=', '.join(f"{METRICS[name]} AS {name}" for name in metrics)
+    )
+    if incremental:
+        history += dialect['recent']
+
+    # Référence de chaque règle : valeur N jours avant, ou mesure précédente (LAG)
+    references = {}
+    for rule in rules:
+        column, name = _reference_column(rule), rule['mesure']
+        if 'fenetre' in rule:
+            references[column] = baseline_sql(name, 'cle', 'jour', rule['fenetre'], backend)
+        else:
+            references[column] = f"LAG({name}) OVER w"
+    windows = ',\n                   '.join(f"{sql} AS {column}" for column, sql in references.items())
+
+    selects = []
+    for rule in rules:
+        valeur, precedent = rule['mesure'], _reference_column(rule)
+        if rule['mode'] == 'pourcentage':
+            variation = f"({valeur} - {precedent}) * 100.0 / {precedent}"
+            guard = f"{precedent} > 0"
+        else:
+            variation = f"{valeur} - {precedent}"
+            guard = f"{precedent} IS NOT NULL"
+        selects.append(f"""
+            SELECT cle, artist_id, plateforme, nom, jour, '{rule['type']}' AS type_alerte,
+                   {valeur} AS valeur, {precedent} AS precedent, {variation} AS variation
+            FROM mesures
+            WHERE suivante IS NULL AND {guard} AND {variation} >= {rule['seuil']}
+        """)
+
+    # LEAD(...) IS NULL : dernière mesure de chaque artiste
+    return f"""
+        WITH mesures AS (
+            SELECT h.*, {windows},
+                   LEAD(date_collecte) OVER w AS suivante
+            FROM ({history}) h
+            WINDOW w AS (PARTITION BY cle ORDER BY date_collecte)
+        )
+        {'UNION ALL'.join(selects)}
+        ORDER BY type_alerte, variation DESC
+    """
+
+
+def evaluate_rules(cursor, backend, since=None, rules=RULES):
+    """Alertes des règles à seuil : tuples (artist_id, plateforme, nom, type, message, palier, empreinte)
+
+    `since` : seuls les artistes collectés après cette date sont évalués.
+    """
+    cursor.execute(compile_rules(backend, rules, incremental=since is not None), {
+        'debut': (date.today() - timedelta(days=HISTORY_DAYS)).isoformat(),
+        'since': since.isoformat(' ') if since is not None else None,
+    })
+
+    by_type = {rule['type']: rule for rule in rules}
+    counts = {}
+    alerts = []
+    for _, artist_id, plateforme, nom, jour, type_alerte, valeur, precedent, variation in cursor.fetchall():
+        counts[type_alerte] = counts.get(type_alerte, 0) + 1
+        if counts[type_alerte] > MAX_ALERTS_PER_RULE:
+            continue
+        rule = by_type[type_alerte]
+        palier = int(variation // rule['palier'])
+        message = rule['message'].format(valeur=valeur, precedent=precedent, variation=variation)
+        fingerprint = alert_fingerprint(artist_id, plateforme, type_alerte, jour, palier)
+        alerts.append((artist_id, plateforme, nom, type_alerte, message, palier, fingerprint))
+    return alerts
+
+
+def evaluate_anomalies(cursor, backend, since=None):
+    """Hausses inhabituelles (anomaly_detection), au même format que evaluate_rules()
+
+    `since` : seuls les artistes collectés après cette date sont scorés.
+    """
+    dialect = BACKENDS[backend]
+    anomalies = anomaly_detection.detect_anomalies(
+        cursor, query=dialect['series'], recent=dialect['series_recent'], since=since
+    )[:MAX_ALERTS_PER_RULE]
+    if not anomalies:
+        return []
+
+    cursor.execute(dialect['artists'], {'cles': dialect['keys']([anomaly[0] for anomaly in anomalies])})
+    artists = {key: rest for key, *rest in cursor.fetchall()}
+
+    alerts = []
+    for key, jour, valeur, precedent, variation, z_score, _ in anomalies:
+        artist_id, plateforme, nom = artists[key]
+        palier = int(variation // ANOMALY_BUCKET)
+        message = ANOMALY_MESSAGE.format(valeur=valeur, precedent=precedent,
+                                         variation=variation, z_score=z_score)
+        fingerprint = alert_fingerprint(artist_id, plateforme, ANOMALY_TYPE, jour, palier)
+        alerts.append((artist_id, plateforme, nom, ANOMALY_TYPE, message, palier, fingerprint))
+    return alerts
+
+
+def run(conn, backend, since=None):
+    """Évalue toutes les règles puis écrit les alertes en un lot ; renvoie (alertes, nombre enregistré)
+
+    Le commit est laissé à l'appelant.
+    """
+    cursor = conn.cursor()
+    BACKENDS[backend]['prepare'](cursor)
+    anomalies = evaluate_anomalies(cursor, backend, since)
+
+    # Une hausse inhabituelle remplace l'alerte à seuil sur les abonnés du même artiste :
+    # toutes deux portent sur sa dernière collecte
+    covered = {(artist_id, plateforme) for artist_id, plateforme, *_ in anomalies}
+    follower_types = {rule['type'] for rule in RULES if rule['mesure'] == 'abonnes'}
+    alerts = [
+        alert for alert in evaluate_rules(cursor, backend, since)
+        if alert[3] not in follower_types or alert[:2] not in covered
+    ] + anomalies
+    inserted = BACKENDS[backend]['write'](cursor, alerts) if alerts else 0
+    cursor.close()
+    return alerts, inserted
@@ -0,0 +1,218 @@
+"""
+Détection statistique des hausses inhabituelles de followers/fans
+Toutes les séries sont chargées dans une matrice NumPy (artistes × jours) et
+scorées en une passe vectorisée :
+- ligne de base EWMA de la croissance journalière de chaque artiste
+- z-score robuste (médiane / MAD) de la dernière croissance par rapport à cette base
+- accélération : variation de la croissance par rapport à la mesure précédente
+
+Un seuil relatif à la volatilité propre de chaque artiste remplace le seuil fixe :
+les petits artistes, très volatils, ne déclenchent plus à chaque collecte et
+une hausse régulière n'est signalée que si elle s'accélère nettement.
+
+Usage: python anomaly_detection.py [--days 60] [--synthetic 50000]
+"""
+import argparse
+import time
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+
+# Historique analysé (jours) et nombre minimal de croissances journalières connues
+LOOKBACK_DAYS = 60
+MIN_POINTS = 14
+
+# Ligne de base : span EWMA, en jours
+EWMA_SPAN = 14
+
+# Seuils : z robuste, hausse absolue minimale (followers/fans)
+Z_THRESHOLD = 3.5
+MIN_ABSOLUTE_INCREASE = 100
+
+# Écart-type ≈ 1,4826 × MAD pour une loi normale ; plancher pour les séries parfaitement régulières
+MAD_TO_SIGMA = 1.4826
+MIN_SCALE = 0.001  # 0,1 point de pourcentage par jour
+
+
+def forward_fill(values):
+    """Reprend la dernière valeur connue sur chaque ligne ; renvoie (valeurs, indice de la valeur reprise)"""
+    columns = np.arange(values.shape[1])
+    source = np.where(np.isnan(values), 0, columns)
+    np.maximum.accumulate(source, axis=1, out=source)
+    return values[np.arange(values.shape[0])[:, None], source], source
+
+
+# (clé artiste, jour depuis `start`, valeur) ; une mesure par artiste et par jour
+SERIES_QUERY = """
+    SELECT artist_key, jour_collecte - %(start)s::date AS jour, COALESCE(followers, fans)
+    FROM metriques_historique
+    WHERE jour_collecte >= %(start)s
+    AND COALESCE(followers, fans) IS NOT NULL
+    {recent}
+"""
+
+# Seuls les artistes collectés après `since` (watermark de detect_alerts)
+SERIES_RECENT = """
+    AND artist_key IN (
+        SELECT artist_key FROM metriques_historique
+        WHERE jour_collecte >= %(since)s::date AND date_collecte > %(since)s
+    )
+"""
+
+
+def load_series(cursor, days=LOOKBACK_DAYS, query=SERIES_QUERY, recent=SERIES_RECENT, since=None):
+    """Séries journalières alignées : (artist_keys, valeurs, premier jour)
+
+    `valeurs` : matrice artistes × jours, NaN les jours sans collecte ;
+    la dernière colonne est le dernier jour collecté. `since` : seules les
+    séries des artistes collectés depuis sont chargées. `query` / `recent` :
+    variantes SQLite (voir alert_engine.BACKENDS).
+    """
+    start = date.today() - timedelta(days=days)
+    cursor.execute(query.format(recent=recent if since is not None else ''), {
+        'start': start.isoformat(),
+        'since': since.isoformat(' ') if since is not None else None,
+    })
+    rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), np.empty((0, 0)), start
+
+    keys, row_index = np.unique(rows[:, 0], return_inverse=True)
+    values = np.full((len(keys), rows[:, 1].max() + 1), np.nan)
+    values[row_index, rows[:, 1]] = rows[:, 2]
+    return keys, values, start
+
+
+def score_series(values):
+    """Scores de la dernière colonne de chaque série (dictionnaire de tableaux alignés sur les lignes)
+
+    `values` : au moins trois jours (colonnes).
+
+    Croissance journalière : variation relative depuis la mesure précédente,
+    divisée par le nombre de jours écoulés (jours sans collecte tolérés).
+    """
+    n_series, n_days = values.shape
+    filled, source = forward_fill(values)
+
+    previous = filled[:, :-1]
+    elapsed = np.arange(1, n_days) - source[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (values[:, 1:] - previous) / previous / elapsed
+    growth[~np.isfinite(growth)] = np.nan
+
+    history, last = growth[:, :-1], growth[:, -1]
+
+    # EWMA : boucle sur les jours, vectorisée sur toutes les séries
+    alpha = 2 / (EWMA_SPAN + 1)
+    baseline = np.full(n_series, np.nan)
+    for column in history.T:
+        seen = ~np.isnan(column)
+        blended = np.where(np.isnan(baseline), column, alpha * column + (1 - alpha) * baseline)
+        baseline = np.where(seen, blended, baseline)
+
+    with warnings.catch_warnings():
+        # Séries sans historique : médianes NaN, écartées par MIN_POINTS
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(history, axis=1)
+        mad = np.nanmedian(np.abs(history - median[:, None]), axis=1)
+    scale = np.maximum(MAD_TO_SIGMA * np.nan_to_num(mad), MIN_SCALE)
+
+    # Croissance de la mesure précédente (dernière valeur connue de l'historique)
+    _, last_seen = forward_fill(history)
+    previous_growth = history[np.arange(n_series), last_seen[:, -1]]
+
+    return {
+        'valeur': values[:, -1],
+        'precedent': previous[:, -1],
+        'croissance_pct': last * 100,
+        'ligne_de_base_pct': baseline * 100,
+        'z_robuste': (last - baseline) / scale,
+        'acceleration_pts': (last - previous_growth) * 100,
+        'points': np.sum(~np.isnan(history), axis=1),
+    }
+
+
+def flag_anomalies(scores):
+    """Masque des séries dont la dernière mesure est une hausse statistiquement inhabituelle"""
+    with np.errstate(invalid='ignore'):
+        return (
+            (scores['points'] >= MIN_POINTS)
+            & (scores['z_robuste'] >= Z_THRESHOLD)
+            & (scores['acceleration_pts'] > 0)
+            & (scores['valeur'] - scores['precedent'] >= MIN_ABSOLUTE_INCREASE)
+        )
+
+
+def detect_anomalies(cursor, days=LOOKBACK_DAYS, query=SERIES_QUERY, recent=SERIES_RECENT, since=None):
+    """Hausses inhabituelles à la dernière collecte, triées par z robuste décroissant
+
+    `since` : seuls les artistes collectés depuis sont scorés, et seule une
+    dernière collecte postérieure est signalée (pas de redite d'un passage à l'autre).
+    Chaque anomalie : (artist_key, jour_collecte, valeur, precedent,
+    croissance_pct, z_robuste, acceleration_pts).
+    """
+    started = time.perf_counter()
+    keys, values, start = load_series(cursor, days, query, recent, since)
+    loaded = time.perf_counter()
+
+    if values.shape[1] < MIN_POINTS + 2:
+        print(f"✅ Anomalies : historique trop court ou aucune nouvelle mesure ({len(keys)} séries)")
+        return []
+
+    jour = start + timedelta(days=values.shape[1] - 1)
+    if since is not None and jour < since.date():
+        return []
+
+    scores = score_series(values)
+    flagged = np.flatnonzero(flag_anomalies(scores))
+    flagged = flagged[np.argsort(-scores['z_robuste'][flagged])]
+    scored = time.perf_counter()
+
+    print(f"📊 Anomalies : {len(keys)} séries × {values.shape[1]} jours, "
+          f"chargement {loaded - started:.2f}s, calcul {scored - loaded:.2f}s → "
+          f"{len(flagged)} hausses inhabituelles")
+
+    return [
+        (int(keys[i]), jour, int(scores['valeur'][i]), int(scores['precedent'][i]),
+         float(scores['croissance_pct'][i]), float(scores['z_robuste'][i]),
+         float(scores['acceleration_pts'][i]))
+        for i in flagged
+    ]
+
+
+def synthetic_series(n_series, n_days, seed=0):
+    """Séries factices (croissance log-normale bruitée, quelques sauts) pour mesurer le temps de calcul"""
+    rng = np.random.default_rng(seed)
+    base = rng.lognormal(mean=8, sigma=2, size=(n_series, 1))
+    trend = rng.normal(0.002, 0.002, size=(n_series, 1))
+    noise = rng.normal(0, 0.01, size=(n_series, n_days))
+    values = np.round(base * np.exp(np.cumsum(trend + noise, axis=1)))
+    jumps = rng.random(n_series) < 0.01
+    values[jumps, -1] *= 1.5
+    values[rng.random(values.shape) < 0.1] = np.nan  # jours sans collecte
+    values[:, -1] = np.where(np.isnan(values[:, -1]), values[:, -2], values[:, -1])
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Détection des hausses inhabituelles de followers/fans")
+    parser.add_argument('--days', type=int, default=LOOKBACK_DAYS,
+                        help="Jours d'historique analysés (défaut: %(default)s)")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="Mesure le temps de calcul sur N séries factices (sans base)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        values = synthetic_series(args.synthetic, args.days)
+        started = time.perf_counter()
+        flagged = flag_anomalies(score_series(values))
+        print(f"✅ {args.synthetic} séries × {args.days} jours scorées en "
+              f"{time.perf_counter() - started:.2f}s → {int(flagged.sum())} hausses inhabituelles")
+    else:
+        import db_pool
+
+        with db_pool.connection() as conn:
+            for key, jour, valeur, precedent, pct, z, acceleration in detect_anomalies(conn.cursor(), args.days)[:20]:
+                print(f"  • artiste {key} ({jour}): {precedent:,} → {valeur:,} "
+                      f"(+{pct:.1f}%, z={z:.1f}, accélération {acceleration:+.1f} pts)")
@@ -0,0 +1,117 @@
+"""
+Classement et rapport console des artistes collectés
+Passe séparée sur la sortie des scrapers (CSV ou dossier Parquet) :
+la collecte n'a plus besoin de garder tous les artistes en mémoire.
+
+Usage: python artist_report.py ../data/deezer_emerging_artists_XXXX.csv
+"""
+import os
+import sys
+
+DEEZER_COLUMNS = [
+    'nom', 'fans', 'total_albums', 'engagement_rate',
+    'score_potentiel', 'radio', 'url_deezer', 'date_extraction'
+]
+
+SPOTIFY_COLUMNS = [
+    'nom', 'followers', 'popularite', 'avg_track_popularity',
+    'growth_indicator', 'score_potentiel', 'last_release_date',
+    'genres', 'url_spotify', 'date_extraction'
+]
+
+# Artistes émergents attendus dans les résultats Deezer (contrôle qualité)
+KNOWN_EMERGING = ['Raplume', 'Guy2Bezbar', 'Luther', 'Zed', 'Lyonzon']
+
+
+def load_ranked(path):
+    """Charge la sortie d'un scraper, triée par score décroissant"""
+    import pandas as pd  # import différé : les scrapers n'en ont besoin que pour le rapport
+
+    if os.path.isdir(path):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return df.sort_values('score_potentiel', ascending=False).reset_index(drop=True)
+
+
+def print_deezer_report(path):
+    import pandas as pd
+
+    df = load_ranked(path)
+    if df.empty:
+        print("\n⚠️ Aucun artiste validé")
+        return
+
+    # TOP 30 AVEC SCORES BIEN VISIBLES
+    print(f"\n🏆 TOP 30 PAR SCORE DE POTENTIEL")
+    print("=" * 80)
+    for idx, row in df.head(30).iterrows():
+        print(f"{row['nom']:<40} {int(row['fans']):>8,} fans | Score: {row['score_potentiel']:>5.1f}")
+
+    # TABLEAU COMPLET
+    print(f"\n" + "=" * 80)
+    print("📋 TABLEAU COMPLET (tous les artistes triés par score)")
+    print("=" * 80)
+
+    pd.set_option('display.max_rows', None)
+    pd.set_option('display.width', None)
+    pd.set_option('display.max_colwidth', 50)
+
+    print(df[DEEZER_COLUMNS].to_string(index=False))
+
+    print(f"\n📊 STATS:")
+    print(f"   Total: {len(df)}")
+    print(f"   Fans moyen: {df['fans'].mean():,.0f}")
+    print(f"   Score moyen: {df['score_potentiel'].mean():.1f}")
+    print(f"   Avec radio: {df['radio'].sum()}")
+
+    # Vérifier quelques noms connus
+    names = set(df['nom'].str.lower())
+    found_known = [name for name in KNOWN_EMERGING if name.lower() in names]
+
+    if found_known:
+        print(f"\n✅ Artistes émergents connus trouvés: {', '.join(found_known)}")
+
+
+def print_spotify_report(path):
+    import pandas as pd
+
+    df = load_ranked(path)
+    if df.empty:
+        print("\nAucun artiste ne correspond aux critères stricts.")
+        return
+
+    print(f"\n{len(df)} ARTISTES ÉMERGENTS TROUVÉS (classés par potentiel)")
+    print("=" * 80)
+
+    pd.set_option('display.max_rows', None)
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', None)
+    pd.set_option('display.max_colwidth', 40)
+
+    print(df[SPOTIFY_COLUMNS].to_string(index=False))
+
+    print("\n" + "=" * 80)
+    print("STATISTIQUES:")
+    print(f"  • Total d'artistes émergents: {len(df)}")
+    print(f"  • Moyenne followers: {df['followers'].mean():.0f}")
+    print(f"  • Médiane followers: {df['followers'].median():.0f}")
+    print(f"  • Moyenne popularité: {df['popularite'].mean():.1f}")
+    print(f"  • Score potentiel moyen: {df['score_potentiel'].mean():.1f}")
+    print(f"  • Meilleur score: {df['score_potentiel'].max():.1f}")
+    print(f"  • Score le plus bas: {df['score_potentiel'].min():.1f}")
+    print(f"\nTop 3 artistes les plus prometteurs:")
+    for i, row in df.head(3).iterrows():
+        print(f"   {i+1}. {row['nom']} - Score: {row['score_potentiel']} | {row['followers']:,} followers")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    output = sys.argv[1]
+    if 'spotify' in os.path.basename(os.path.normpath(output)):
+        print_spotify_report(output)
+    else:
+        print_deezer_report(output)
@@ -0,0 +1,249 @@
+"""
+Écriture en flux des artistes validés (CSV, Parquet et/ou PostgreSQL)
+Les enregistrements sont écrits par lots au fil de la collecte : la mémoire
+reste constante et les résultats partiels survivent à un crash.
+
+`commit()` rend tout ce qui a été écrit durable et renvoie un marqueur que
+l'on range dans le checkpoint ; à la reprise, `open_sink(..., marker=...)`
+coupe ce qui a été écrit après ce marqueur (sinon doublons). En cas
+d'interruption, `abort()` ferme la sortie sans valider le lot en cours.
+"""
+import csv
+import glob
+import os
+
+BATCH_SIZE = 50
+
+
+class CsvArtistSink:
+    """CSV en ajout ; le marqueur est la taille du fichier au dernier commit"""
+
+    def __init__(self, path, columns, batch_size=BATCH_SIZE, marker=None):
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+        if marker is not None and os.path.exists(path):
+            # Reprise : on jette les lignes écrites après le dernier checkpoint
+            with open(path, 'r+b') as f:
+                f.truncate(marker)
+            self.file = open(path, 'a', newline='', encoding='utf-8')
+            self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction='ignore')
+        else:
+            # utf-8-sig : BOM en tête pour Excel, comme les exports précédents
+            self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+            self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.writerows(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def commit(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.commit()
+        self.file.close()
+
+    def abort(self):
+        # Interruption : les lignes après le marqueur seront coupées à la reprise
+        self.file.close()
+
+
+class ParquetArtistSink:
+    """Dossier de fichiers Parquet ; un fichier (part) est fermé à chaque commit
+
+    Un fichier Parquet n'est lisible qu'une fois fermé : en tournant de part
+    à chaque checkpoint, tout ce qui a été commité reste exploitable.
+    Le marqueur est le nombre de parts complètes.
+    """
+
+    def __init__(self, path, columns, batch_size=BATCH_SIZE, marker=None):
+        import pyarrow  # dépendance optionnelle (format parquet uniquement)
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+        self.writer = None
+        self.schema = None
+
+        os.makedirs(path, exist_ok=True)
+        self.parts = marker or 0
+
+        # Reprise : suppression des parts écrites après le dernier checkpoint
+        for part in glob.glob(os.path.join(path, 'part-*.parquet')):
+            if int(os.path.basename(part)[5:10]) > self.parts:
+                os.remove(part)
+
+    def write(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        rows = [{col: rec.get(col) for col in self.columns} for rec in self.buffer]
+        if self.schema is None:
+            # Schéma figé au premier lot (colonnes encore vides => texte)
+            inferred = self.pa.Table.from_pylist(rows).schema
+            self.schema = self.pa.schema([
+                field.with_type(self.pa.string()) if self.pa.types.is_null(field.type) else field
+                for field in inferred
+            ])
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        if self.writer is None:
+            part_path = os.path.join(self.path, f'part-{self.parts + 1:05d}.parquet')
+            self.writer = self.pq.ParquetWriter(part_path, self.schema)
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def commit(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.parts += 1
+        return self.parts
+
+    def close(self):
+        self.commit()
+
+    def abort(self):
+        # La part en cours sera supprimée à la reprise
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class DatabaseArtistSink:
+    """Écriture directe dans artistes + metriques_historique (PostgreSQL)
+
+    Chaque lot est envoyé (COPY) dans la transaction en cours, que `commit()`
+    valide : après un crash, ce qui suit le dernier commit est annulé par la
+    base, il n'y a rien à couper à la reprise. Le marqueur est le nombre de
+    lignes validées.
+    """
+
+    def __init__(self, plateforme, batch_size=BATCH_SIZE, marker=None, mirror_path=None):
+        import database_postgres  # dépendance optionnelle (psycopg2, DATABASE_URL)
+
+        self.db = database_postgres
+        self.plateforme = plateforme
+        self.batch_size = batch_size
+        # Fichier écrit en parallèle : inscrit au manifeste pour ne pas être réimporté
+        self.mirror_path = mirror_path
+        self.path = None
+        self.buffer = []
+        self.count = 0
+        self.committed = marker or 0
+        self.pending = 0
+        # Connexion empruntée au pool du processus pour toute la collecte
+        self.pool = database_postgres.db_pool.get_pool()
+        self.conn = self.pool.getconn()
+        self.cursor = self.conn.cursor()
+
+    def write(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            rows = [self.db.staging_row(record, self.plateforme) for record in self.buffer]
+            self.pending += self.db.bulk_import_file(self.cursor, rows, self.plateforme)
+            self.buffer = []
+
+    def commit(self):
+        self.flush()
+        self.conn.commit()
+        self.committed += self.pending
+        self.pending = 0
+        return self.committed
+
+    def close(self):
+        try:
+            self.commit()
+            if self.mirror_path and os.path.isfile(self.mirror_path):
+                self.db.record_imported_file(self.cursor, self.mirror_path, self.committed)
+            # Fin de collecte : la vue des dernières mesures suit
+            self.db.refresh_latest_metrics(self.cursor)
+            self.conn.commit()
+        finally:
+            self.cursor.close()
+            self.pool.putconn(self.conn)
+
+    def abort(self):
+        # Interruption : rien de ce qui suit le dernier checkpoint n'est validé
+        # (putconn annule la transaction en cours)
+        self.cursor.close()
+        self.pool.putconn(self.conn)
+
+
+class MultiSink:
+    """Plusieurs sorties alimentées ensemble ; le marqueur est la liste de leurs marqueurs"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.path = next((sink.path for sink in sinks if sink.path), None)
+
+    def write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    def commit(self):
+        return [sink.commit() for sink in self.sinks]
+
+    def close(self):
+        # Fichiers d'abord : la base inscrit au manifeste le fichier complet
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
+
+
+SINK_TYPES = {'csv': CsvArtistSink, 'parquet': ParquetArtistSink}
+
+
+def output_path(prefix, fmt, timestamp):
+    """../data/<prefix>_<timestamp>.csv (ou dossier .parquet)"""
+    return os.path.join(os.path.dirname(__file__), '..', 'data', f'{prefix}_{timestamp}.{fmt}')
+
+
+def open_sink(path, fmt, columns, marker=None, db_platform=None):
+    """Sortie fichier (si `path`) et/ou base (si `db_platform`)
+
+    Avec les deux, `marker` est la liste rendue par MultiSink.commit().
+    """
+    if not db_platform:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SINK_TYPES[fmt](path, columns, marker=marker)
+    
+    if not path:
+        return DatabaseArtistSink(db_platform, marker=marker)
+    
+    file_marker, db_marker = marker if marker is not None else (None, None)
+    file_sink = open_sink(path, fmt, columns, marker=file_marker)
+    return MultiSink([file_sink, DatabaseArtistSink(db_platform, marker=db_marker, mirror_path=path)])
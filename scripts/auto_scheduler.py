@@ -6,6 +6,9 @@ from datetime import datetime
 import logging
 import os
 
+import alert_engine
+import spotify_scraper
+
 DB_NAME = 'jek2_records.db'
 
 # Configuration du logging
@@ -22,90 +25,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def detect_growth_alerts():
-    """Detecte les artistes en forte croissance et cree des alertes"""
+    """Detecte les artistes en forte croissance et cree des alertes (moteur commun alert_engine)"""
     logger.info("Detection des alertes de croissance...")
     
     conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # Requete pour detecter la croissance
-    query = '''
-        WITH latest_metrics AS (
-            SELECT 
-                artist_id,
-                plateforme,
-                followers,
-                fans,
-                score_potentiel,
-                date_collecte,
-                ROW_NUMBER() OVER (PARTITION BY artist_id, plateforme ORDER BY date_collecte DESC) as rn
-            FROM metriques_historique
-        ),
-        previous_metrics AS (
-            SELECT 
-                artist_id,
-                plateforme,
-                followers,
-                fans,
-                score_potentiel,
-                date_collecte,
-                ROW_NUMBER() OVER (PARTITION BY artist_id, plateforme ORDER BY date_collecte DESC) as rn
-            FROM metriques_historique
-        )
-        SELECT 
-            l.artist_id,
-            a.nom,
-            l.plateforme,
-            COALESCE(l.followers, l.fans) as latest_followers,
-            COALESCE(p.followers, p.fans) as previous_followers,
-            l.score_potentiel as latest_score,
-            p.score_potentiel as previous_score
-        FROM latest_metrics l
-        JOIN previous_metrics p ON l.artist_id = p.artist_id AND l.plateforme = p.plateforme
-        JOIN artistes a ON l.artist_id = a.artist_id
-        WHERE l.rn = 1 AND p.rn = 2
-    '''
     
     try:
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        alerts_created = 0
+        with conn:
+            alerts, inserted = alert_engine.run(conn, 'sqlite')
         
-        for row in results:
-            artist_id, nom, plateforme, latest_followers, previous_followers, latest_score, previous_score = row
-            
-            if latest_followers and previous_followers and previous_followers > 0:
-                growth_pct = ((latest_followers - previous_followers) / previous_followers) * 100
-                
-                # Alerte si croissance > 20%
-                if growth_pct >= 20:
-                    message = f"Forte croissance de {growth_pct:.1f}% des followers sur {plateforme} ({previous_followers} -> {latest_followers})"
-                    
-                    cursor.execute('''
-                        INSERT INTO alertes (artist_id, nom_artiste, type_alerte, message, date_alerte, vu)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (artist_id, nom, 'FORTE_CROISSANCE', message, datetime.now(), 0))
-                    
-                    alerts_created += 1
-                    logger.info(f"Alerte creee: {nom} - {message}")
-            
-            # Alerte si score augmente significativement
-            if latest_score and previous_score:
-                score_increase = latest_score - previous_score
-                if score_increase >= 10:
-                    message = f"Score en hausse de {score_increase:.1f} points ({previous_score:.1f} -> {latest_score:.1f})"
-                    
-                    cursor.execute('''
-                        INSERT INTO alertes (artist_id, nom_artiste, type_alerte, message, date_alerte, vu)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (artist_id, nom, 'AMELIORATION_SCORE', message, datetime.now(), 0))
-                    
-                    alerts_created += 1
-                    logger.info(f"Alerte creee: {nom} - {message}")
-        
-        conn.commit()
-        logger.info(f"{alerts_created} nouvelles alertes creees")
+        for _, plateforme, nom, _, message, _, _ in alerts:
+            logger.info(f"Alerte detectee: {nom} ({plateforme}) - {message}")
+        logger.info(f"{inserted} nouvelles alertes creees ({len(alerts) - inserted} deja signalees)")
         
     except Exception as e:
         logger.error(f"Erreur detection alertes: {e}")
@@ -113,57 +44,55 @@ def detect_growth_alerts():
     finally:
         conn.close()
 
+def run_scraper(script, label, attempts=2):
+    """Execute un scraper ; apres un timeout, relance en reprenant le checkpoint"""
+    for attempt in range(1, attempts + 1):
+        try:
+            result = subprocess.run(
+                # --resume : ne reprend que si un checkpoint recent existe
+                ['python', script, '--resume'],
+                cwd='../scripts',
+                capture_output=True,
+                text=True,
+                timeout=1800  # 30 minutes max
+            )
+            
+            if result.returncode == 0:
+                logger.info(f"Collecte {label} reussie")
+                logger.info(result.stdout)
+            else:
+                logger.error(f"Erreur collecte {label}: {result.stderr}")
+            return
+            
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout collecte {label} (> 30 min) - tentative {attempt}/{attempts}")
+            if attempt < attempts:
+                logger.info(f"Reprise de la collecte {label} depuis le checkpoint...")
+        except Exception as e:
+            logger.error(f"Erreur execution {label}: {e}")
+            return
+
 def run_spotify_scraper():
     """Execute le scraper Spotify"""
     logger.info("=" * 70)
     logger.info("Lancement collecte Spotify...")
     logger.info("=" * 70)
     
+    # Dans le processus du scheduler : pas de nouvel interpreteur a chaque
+    # collecte, le client Spotify et ses connexions restent ouverts
     try:
-        result = subprocess.run(
-            ['python', 'spotify_scraper.py'],
-            cwd='../scripts',
-            capture_output=True,
-            text=True,
-            timeout=1800  # 30 minutes max
-        )
-        
-        if result.returncode == 0:
-            logger.info("Collecte Spotify reussie")
-            logger.info(result.stdout)
-        else:
-            logger.error(f"Erreur collecte Spotify: {result.stderr}")
-            
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout collecte Spotify (> 30 min)")
+        summary = spotify_scraper.run_collection(resume=True, report=False)
+        logger.info(f"Collecte Spotify reussie: {summary['validated']} artistes -> {summary['output']}")
     except Exception as e:
-        logger.error(f"Erreur execution Spotify: {e}")
+        logger.error(f"Erreur collecte Spotify: {e}")
 
 def run_deezer_scraper():
-    """Execute le scraper Deezer"""
+    """Execute le scraper Deezer (V6, exploration par graphe)"""
     logger.info("=" * 70)
     logger.info("Lancement collecte Deezer...")
     logger.info("=" * 70)
     
-    try:
-        result = subprocess.run(
-            ['python', 'deezer_scraper.py'],
-            cwd='../scripts',
-            capture_output=True,
-            text=True,
-            timeout=1800  # 30 minutes max
-        )
-        
-        if result.returncode == 0:
-            logger.info("Collecte Deezer reussie")
-            logger.info(result.stdout)
-        else:
-            logger.error(f"Erreur collecte Deezer: {result.stderr}")
-            
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout collecte Deezer (> 30 min)")
-    except Exception as e:
-        logger.error(f"Erreur execution Deezer: {e}")
+    run_scraper('deezer_scraper_FINAL.py', 'Deezer')
 
 def update_database():
     """Met a jour la base de donnees avec les nouvelles donnees"""
@@ -0,0 +1,69 @@
+"""
+Points de reprise (checkpoints) des scrapers JEK2 Records
+L'état de la collecte est écrit périodiquement sur disque pour qu'un
+crash ou un timeout du scheduler ne fasse pas repartir de zéro (--resume)
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'checkpoints')
+SAVE_INTERVAL = 30            # secondes entre deux sauvegardes
+MAX_AGE_HOURS = 12            # au-delà, le checkpoint est ignoré (données périmées)
+
+
+class CrawlCheckpoint:
+    """Fichier JSON écrit de façon atomique (tmp + rename)"""
+
+    def __init__(self, name, directory=CHECKPOINT_DIR, interval=SAVE_INTERVAL,
+                 max_age_hours=MAX_AGE_HOURS):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{name}.json')
+        self.interval = interval
+        self.max_age_hours = max_age_hours
+        self.last_saved = 0.0
+        self.saves = 0
+
+    def load(self):
+        """Renvoie l'état sauvegardé, ou None s'il n'existe pas / est trop ancien"""
+        if not os.path.exists(self.path):
+            return None
+
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Checkpoint illisible ({self.path}): {e}")
+            return None
+
+        saved_at = datetime.fromisoformat(state.get('saved_at', '1970-01-01T00:00:00'))
+        age_hours = (datetime.now() - saved_at).total_seconds() / 3600
+        if age_hours > self.max_age_hours:
+            print(f"⚠️ Checkpoint ignoré (vieux de {age_hours:.0f}h)")
+            return None
+
+        return state
+
+    def save(self, state):
+        state = dict(state, saved_at=datetime.now().isoformat(timespec='seconds'))
+        tmp_path = f'{self.path}.tmp'
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+        self.last_saved = time.monotonic()
+        self.saves += 1
+
+    def maybe_save(self, get_state):
+        """Sauvegarde si l'intervalle est écoulé (`get_state` n'est appelé qu'à ce moment)"""
+        if time.monotonic() - self.last_saved >= self.interval:
+            self.save(get_state())
+            return True
+        return False
+
+    def clear(self):
+        """Collecte terminée : le checkpoint n'a plus lieu d'être"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
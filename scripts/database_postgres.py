@@ -1,106 +1,183 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
-import pandas as pd
 import glob
+import io
+import re
+import time
 from datetime import datetime
 import hashlib
 
-# Charger les variables d'environnement depuis .env
-try:
-    from dotenv import load_dotenv
-    # Charger depuis le dossier parent (racine du projet)
-    env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-    load_dotenv(env_path)
-    print(f"✅ Chargement .env depuis : {env_path}")
-except ImportError:
-    print("⚠️ python-dotenv non installé")
-
-def get_database_url():
-    """Récupère l'URL de la base de données"""
-    db_url = os.getenv("DATABASE_URL", "")
-    if db_url:
-        print("✅ DATABASE_URL trouvée dans .env")
-        return db_url
-    
-    # Essayer secrets Streamlit en fallback
-    try:
-        import streamlit as st
-        db_url = st.secrets["DATABASE_URL"]
-        print("✅ DATABASE_URL trouvée dans secrets.toml")
-        return db_url
-    except:
-        pass
-    
-    print("\n❌ DATABASE_URL non trouvée !")
-    print("\n📋 SOLUTIONS :")
-    print("\n1️⃣ Vérifier .env dans le dossier racine")
-    print("   cd ~/path/to/MusicTalentRadar")
-    print('   echo "DATABASE_URL=postgresql://..." > .env')
-    print("\n2️⃣ Ou vérifier .streamlit/secrets.toml")
-    print("   DATABASE_URL = \"postgresql://...\"")
-    
-    raise Exception("DATABASE_URL non configurée")
-
-def get_connection():
-    """Crée une connexion à la base PostgreSQL"""
-    db_url = get_database_url()
-    if not db_url:
-        raise Exception("DATABASE_URL non configurée")
-    return psycopg2.connect(db_url)
+# URL (.env / secrets Streamlit) et pool de connexions partagés avec le dashboard
+import db_pool
+from db_pool import get_database_url
 
 def generate_artist_id(nom, plateforme):
-    """Génère un ID unique basé sur le nom et la plateforme"""
+    """Génère un ID unique basé sur le nom et la plateforme
+
+    Ancienne clé des artistes, gardée en dernier recours (voir native_artist_id).
+    """
     data = f"{nom}_{plateforme}".encode('utf-8')
     return hashlib.md5(data).hexdigest()[:16]
 
-def init_database():
-    """Initialise les tables PostgreSQL"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS artistes (
-            id SERIAL PRIMARY KEY,
-            artist_id VARCHAR(255) NOT NULL,
-            nom VARCHAR(255) NOT NULL,
-            plateforme VARCHAR(50) NOT NULL,
-            url TEXT,
-            image_url TEXT,
-            date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(artist_id, plateforme)
-        )
-    """)
-    
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_artist_id ON artistes(artist_id)
-    """)
+# ID natif dans l'URL d'un artiste (deezer.com/artist/<id>, open.spotify.com/artist/<id>)
+ARTIST_URL_ID = re.compile(r'/artist/([A-Za-z0-9]+)')
+
+def parse_native_id(native_id, url):
+    """ID de l'artiste sur sa plateforme : colonne du scraper, sinon extrait de l'URL"""
+    if isinstance(native_id, float):
+        # Colonne numérique lue par pandas (Deezer) : 12345.0 / NaN
+        native_id = None if native_id != native_id else int(native_id)
+    if native_id is not None and str(native_id).strip():
+        return str(native_id).strip()
     
+    match = ARTIST_URL_ID.search(url) if isinstance(url, str) else None
+    return match.group(1) if match else None
+
+def native_artist_id(native_id, url, nom, plateforme):
+    """Clé d'un artiste dans artistes.artist_id
+
+    L'ID de la plateforme est stable (renommage, homonymes) ; l'empreinte
+    du nom ne sert plus que pour les vieux fichiers sans ID ni URL.
+    """
+    return parse_native_id(native_id, url) or generate_artist_id(nom, plateforme)
+
+# Valeurs du type énuméré plateforme_code (ALTER TYPE ... ADD VALUE pour en ajouter)
+PLATFORMS = ('Spotify', 'Deezer')
+
+# Une ligne par artiste (artist_key = artistes.id) : la mesure la plus récente,
+# avec les clés texte (artist_id, plateforme) attendues par le dashboard et les alertes
+LATEST_METRICS_QUERY = """
+    SELECT l.*, a.artist_id, a.plateforme, a.nom AS nom_artiste, a.url, a.plateforme AS platform
+    FROM (
+        SELECT DISTINCT ON (m.artist_key) m.*
+        FROM metriques_historique m
+        ORDER BY m.artist_key, m.jour_collecte DESC
+    ) l
+    JOIN artistes a ON a.id = l.artist_key
+"""
+
+# Partitions mensuelles créées à l'avance (au-delà du mois en cours)
+PARTITIONS_AHEAD = 2
+
+def create_platform_type(cursor, values=PLATFORMS):
+    """Type énuméré des plateformes (4 octets au lieu d'un VARCHAR répété)"""
+    cursor.execute("SELECT 1 FROM pg_type WHERE typname = 'plateforme_code'")
+    if cursor.fetchone() is None:
+        labels = ', '.join(f"'{value}'" for value in values)
+        cursor.execute(f"CREATE TYPE plateforme_code AS ENUM ({labels})")
+
+def create_metrics_table(cursor):
+    """metriques_historique partitionnée par mois sur jour_collecte
+
+    Une seule mesure par artiste et par jour de collecte : l'index unique
+    doit contenir la clé de partitionnement, d'où jour_collecte
+    (= date_collecte::date, renseigné à l'insertion). Les requêtes bornées
+    en jour ne lisent que les partitions concernées ; l'index BRIN sur
+    date_collecte reste minuscule (les lignes arrivent dans l'ordre
+    chronologique).
+
+    L'artiste est référencé par artist_key (= artistes.id, qui porte aussi
+    la plateforme) : lignes et index restent étroits.
+    """
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS metriques_historique (
-            id SERIAL PRIMARY KEY,
-            artist_id VARCHAR(255) NOT NULL,
-            plateforme VARCHAR(50) NOT NULL,
-            date_collecte TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            id SERIAL,
+            artist_key INTEGER NOT NULL,
+            date_collecte TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            jour_collecte DATE NOT NULL DEFAULT CURRENT_DATE,
             followers INTEGER,
             fans INTEGER,
-            popularite INTEGER,
+            popularite SMALLINT,
             score_potentiel DECIMAL(5,2),
             engagement_rate DECIMAL(5,2),
-            total_albums INTEGER
-        )
+            total_albums SMALLINT,
+            PRIMARY KEY (id, jour_collecte)
+        ) PARTITION BY RANGE (jour_collecte)
     """)
     
+    # Clé d'upsert des imports ; sert aussi aux recherches par artiste
+    # (dernière mesure, mesure précédente : une lecture d'index)
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_metrics_artist_platform 
-        ON metriques_historique(artist_id, plateforme)
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_metrics_artist_jour
+        ON metriques_historique(artist_key, jour_collecte)
     """)
     
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_date_collecte 
-        ON metriques_historique(date_collecte DESC)
+        CREATE INDEX IF NOT EXISTS idx_date_collecte_brin
+        ON metriques_historique USING BRIN (date_collecte)
+    """)
+
+def create_rollup_table(cursor):
+    """Historique compacté (metrics_rollup) : une ligne par artiste et par semaine / mois"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS metriques_agregees (
+            resolution VARCHAR(10) NOT NULL,
+            artist_key INTEGER NOT NULL,
+            periode DATE NOT NULL,
+            nb_mesures INTEGER NOT NULL,
+            followers_min INTEGER,
+            followers_max INTEGER,
+            followers_dernier INTEGER,
+            fans_min INTEGER,
+            fans_max INTEGER,
+            fans_dernier INTEGER,
+            score_moyen DECIMAL(5,2),
+            date_derniere TIMESTAMP NOT NULL,
+            PRIMARY KEY (resolution, artist_key, periode)
+        )
     """)
+
+def is_partitioned(cursor, table='metriques_historique'):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE relname = %s", (table,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+def has_column(cursor, table, column):
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = %s AND column_name = %s)
+    """, (table, column))
+    return cursor.fetchone()[0]
+
+def metrics_schema_current(cursor):
+    """metriques_historique a le schéma de create_metrics_table (sinon : db_migrations.py)"""
+    return is_partitioned(cursor) and has_column(cursor, 'metriques_historique', 'artist_key')
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def ensure_partitions(cursor, first=None, last=None):
+    """Crée les partitions mensuelles manquantes de `first` à `last` (+ PARTITIONS_AHEAD)
+
+    Sans argument : mois en cours et suivants.
+    """
+    month = _month_start(first or datetime.now())
+    end = _month_start(last or datetime.now())
+    for _ in range(PARTITIONS_AHEAD):
+        end = _next_month(end)
     
+    while month <= end:
+        upper = _next_month(month)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS metriques_historique_{month:%Y_%m}
+            PARTITION OF metriques_historique
+            FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')
+        """)
+        month = upper
+
+def create_alerts_table(cursor):
+    """Alertes ; une empreinte par alerte (voir alert_engine.alert_fingerprint)
+
+    Les colonnes ajoutées après coup le sont aussi sur une base existante.
+    """
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS alertes (
             id SERIAL PRIMARY KEY,
@@ -112,148 +189,408 @@ def init_database():
             vu BOOLEAN DEFAULT FALSE
         )
     """)
+    cursor.execute("ALTER TABLE alertes ADD COLUMN IF NOT EXISTS plateforme plateforme_code")
+    cursor.execute("ALTER TABLE alertes ADD COLUMN IF NOT EXISTS palier SMALLINT")
+    cursor.execute("ALTER TABLE alertes ADD COLUMN IF NOT EXISTS fingerprint CHAR(32)")
     
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_alertes_artist ON alertes(artist_id)
     """)
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # Anciennes alertes sans empreinte : NULL, non concernées par l'unicité
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_alertes_fingerprint ON alertes(fingerprint)
+    """)
+
+def create_growth_table(cursor):
+    """Croissance 1/7/30 jours par artiste (growth_metrics.py) : une ligne par artiste"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS growth_metrics (
+            artist_key INTEGER PRIMARY KEY,
+            jour_collecte DATE NOT NULL,
+            date_collecte TIMESTAMP NOT NULL,
+            valeur INTEGER,
+            croissance_1j INTEGER,
+            croissance_1j_pct DECIMAL(10,2),
+            croissance_7j INTEGER,
+            croissance_7j_pct DECIMAL(10,2),
+            croissance_30j INTEGER,
+            croissance_30j_pct DECIMAL(10,2),
+            date_calcul TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def create_watermark_table(cursor):
+    """Dernière date_collecte traitée par chaque tâche incrémentale (ex. détection d'alertes)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS watermarks (
+            tache VARCHAR(50) PRIMARY KEY,
+            date_collecte TIMESTAMP NOT NULL,
+            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def get_watermark(cursor, tache, default):
+    cursor.execute("SELECT date_collecte FROM watermarks WHERE tache = %s", (tache,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+def set_watermark(cursor, tache, date_collecte):
+    """À valider dans la même transaction que le résultat de la tâche"""
+    cursor.execute("""
+        INSERT INTO watermarks (tache, date_collecte) VALUES (%s, %s)
+        ON CONFLICT (tache) DO UPDATE
+        SET date_collecte = EXCLUDED.date_collecte, date_maj = CURRENT_TIMESTAMP
+    """, (tache, date_collecte))
+
+def create_latest_metrics_view(cursor):
+    """Dernière mesure par artiste et plateforme (dashboard, alertes)"""
+    cursor.execute(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS latest_metrics AS
+        {LATEST_METRICS_QUERY}
+    """)
+    
+    # Index unique : requis par REFRESH ... CONCURRENTLY
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_latest_metrics_artist
+        ON latest_metrics(artist_key)
+    """)
+
+def init_database():
+    """Initialise les tables PostgreSQL"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+    
+        create_platform_type(cursor)
+    
+        # id : clé de substitution (artist_key) utilisée par l'historique
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS artistes (
+                id SERIAL PRIMARY KEY,
+                artist_id VARCHAR(255) NOT NULL,
+                nom VARCHAR(255) NOT NULL,
+                plateforme plateforme_code NOT NULL,
+                url TEXT,
+                image_url TEXT,
+                date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(artist_id, plateforme)
+            )
+        """)
+    
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_artist_id ON artistes(artist_id)
+        """)
+    
+        # Base créée avec un ancien schéma : l'historique est repris par db_migrations.py
+        legacy = table_exists(cursor, 'metriques_historique') and not metrics_schema_current(cursor)
+        if legacy:
+            print("⚠️ metriques_historique a un ancien schéma : python db_migrations.py metriques")
+        else:
+            create_metrics_table(cursor)
+            ensure_partitions(cursor)
+            create_rollup_table(cursor)
+            create_growth_table(cursor)
+    
+        create_alerts_table(cursor)
+    
+        create_watermark_table(cursor)
+    
+        # Manifeste des CSV déjà importés : un fichier n'est relu que s'il a changé
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS imported_files (
+                id SERIAL PRIMARY KEY,
+                fichier VARCHAR(255) NOT NULL,
+                content_hash CHAR(64) NOT NULL,
+                taille BIGINT,
+                modifie_le DOUBLE PRECISION,
+                nb_lignes INTEGER,
+                date_import TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fichier, content_hash)
+            )
+        """)
+    
+        if not legacy:
+            create_latest_metrics_view(cursor)
+    
+        conn.commit()
+        cursor.close()
     
     print("OK Base de donnees PostgreSQL initialisee")
 
-def import_csv_to_postgres():
-    """Importe les données CSV vers PostgreSQL"""
-    if os.path.exists('../data'):
-        data_path = '../data'
-    elif os.path.exists('data'):
-        data_path = 'data'
+def refresh_latest_metrics(cursor):
+    """Recalcule latest_metrics sans bloquer les lectures (fin de collecte / d'import)"""
+    cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY latest_metrics")
+
+# Colonnes de la table de transit (une ligne par artiste d'un CSV)
+STAGING_COLUMNS = [
+    'artist_id', 'nom', 'url', 'followers', 'fans', 'popularite',
+    'score_potentiel', 'engagement_rate', 'total_albums', 'date_collecte'
+]
+
+# Par plateforme : fichiers, colonnes ID natif et URL, métriques (valeur manquante => 0)
+CSV_SOURCES = {
+    'Spotify': {
+        'pattern': 'spotify_emerging_artists_*.csv',
+        'id': 'id',
+        'url': 'url_spotify',
+        'metrics': {'followers': 'int', 'popularite': 'int', 'score_potentiel': 'float'},
+    },
+    'Deezer': {
+        'pattern': 'deezer_emerging_artists_*.csv',
+        'id': 'artist_id',
+        'url': 'url_deezer',
+        'metrics': {'fans': 'int', 'score_potentiel': 'float',
+                    'engagement_rate': 'float', 'total_albums': 'int'},
+    },
+}
+
+def prepare_import_frame(df, plateforme):
+    """Convertit un CSV de scraper en lignes de transit (sans boucle par ligne)"""
+    import pandas as pd  # import différé : inutile pour l'écriture directe des scrapers
+
+    source = CSV_SOURCES[plateforme]
+    df = df.dropna(subset=['nom']).reset_index(drop=True)
+    # Anciens CSV : pas de colonne ID (Spotify), l'URL la contient
+    ids = df[source['id']] if source['id'] in df else [None] * len(df)
+    urls = df[source['url']] if source['url'] in df else [None] * len(df)
+    staged = pd.DataFrame({
+        'artist_id': [native_artist_id(native_id, url, nom, plateforme)
+                      for native_id, url, nom in zip(ids, urls, df['nom'])],
+        'nom': df['nom'],
+        'url': df[source['url']].fillna('') if source['url'] in df else '',
+    })
+    
+    for column in STAGING_COLUMNS[3:-1]:
+        dtype = source['metrics'].get(column)
+        if dtype is None:
+            staged[column] = None
+        elif column in df:
+            staged[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype(dtype)
+        else:
+            staged[column] = 0
+    
+    if 'date_extraction' in df:
+        staged['date_collecte'] = df['date_extraction'].fillna(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     else:
+        staged['date_collecte'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    return staged[STAGING_COLUMNS]
+
+def staging_row(record, plateforme):
+    """Même conversion que prepare_import_frame, pour un artiste sortant d'un scraper"""
+    source = CSV_SOURCES[plateforme]
+    url = record.get(source['url']) or ''
+    row = [native_artist_id(record.get(source['id']), url, record['nom'], plateforme), record['nom'], url]
+    
+    for column in STAGING_COLUMNS[3:-1]:
+        dtype = source['metrics'].get(column)
+        if dtype is None:
+            row.append(None)
+        else:
+            row.append((int if dtype == 'int' else float)(record.get(column) or 0))
+    
+    row.append(record.get('date_extraction') or datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    return row
+
+def _copy_value(value):
+    """Valeur au format texte de COPY (\\N = NULL)"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def file_sha256(path):
+    """Empreinte du contenu d'un fichier (lu par blocs)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_import_manifest(cursor):
+    """Dernière version importée de chaque fichier : {fichier: (hash, taille, mtime)}"""
+    cursor.execute("""
+        SELECT DISTINCT ON (fichier) fichier, content_hash, taille, modifie_le
+        FROM imported_files
+        ORDER BY fichier, date_import DESC
+    """)
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def record_imported_file(cursor, path, nb_lignes, content_hash=None):
+    """Inscrit un fichier dans le manifeste (à valider avec les données)"""
+    cursor.execute("""
+        INSERT INTO imported_files (fichier, content_hash, taille, modifie_le, nb_lignes)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (fichier, content_hash) DO UPDATE
+        SET taille = EXCLUDED.taille, modifie_le = EXCLUDED.modifie_le,
+            nb_lignes = EXCLUDED.nb_lignes, date_import = CURRENT_TIMESTAMP
+    """, (os.path.basename(path), content_hash or file_sha256(path),
+          os.path.getsize(path), os.path.getmtime(path), nb_lignes))
+
+def bulk_import_file(cursor, rows, plateforme):
+    """COPY dans une table temporaire puis 2 requêtes ensemblistes
+
+    `rows` : tuples dans l'ordre de STAGING_COLUMNS.
+    Une mesure par artiste et par jour : un scraper relancé, ou un fichier
+    réimporté, met à jour la mesure du jour (la plus récente l'emporte)
+    au lieu d'en ajouter une. Renvoie le nombre de mesures écrites.
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS import_transit (
+            artist_id VARCHAR(255),
+            nom VARCHAR(255),
+            url TEXT,
+            followers INTEGER,
+            fans INTEGER,
+            popularite INTEGER,
+            score_potentiel DECIMAL(5,2),
+            engagement_rate DECIMAL(5,2),
+            total_albums INTEGER,
+            date_collecte TIMESTAMP
+        ) ON COMMIT DELETE ROWS
+    """)
+    # Plusieurs lots possibles dans une même transaction (écriture directe)
+    cursor.execute("TRUNCATE import_transit")
+    
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY import_transit ({', '.join(STAGING_COLUMNS)}) FROM STDIN", buffer)
+    
+    # Les mesures d'un vieux CSV peuvent tomber dans un mois sans partition
+    cursor.execute("SELECT MIN(date_collecte), MAX(date_collecte) FROM import_transit")
+    first, last = cursor.fetchone()
+    if first is not None and is_partitioned(cursor):
+        ensure_partitions(cursor, first, last)
+    
+    # Le nom est un attribut : un artiste renommé garde sa clé et son historique
+    cursor.execute("""
+        INSERT INTO artistes AS a (artist_id, nom, plateforme, url, image_url)
+        SELECT DISTINCT ON (t.artist_id) t.artist_id, t.nom, %s::plateforme_code, t.url, ''
+        FROM import_transit t
+        ORDER BY t.artist_id, t.date_collecte DESC
+        ON CONFLICT (artist_id, plateforme) DO UPDATE SET
+            nom = EXCLUDED.nom,
+            url = COALESCE(NULLIF(EXCLUDED.url, ''), a.url)
+        WHERE a.nom IS DISTINCT FROM EXCLUDED.nom
+           OR (EXCLUDED.url <> '' AND a.url IS DISTINCT FROM EXCLUDED.url)
+    """, (plateforme,))
+    
+    # DISTINCT ON : un même lot ne peut pas toucher deux fois la même ligne
+    cursor.execute("""
+        INSERT INTO metriques_historique AS m
+        (artist_key, followers, fans, popularite, score_potentiel,
+         engagement_rate, total_albums, date_collecte, jour_collecte)
+        SELECT DISTINCT ON (a.id, t.date_collecte::date)
+               a.id, t.followers, t.fans, t.popularite, t.score_potentiel,
+               t.engagement_rate, t.total_albums, t.date_collecte, t.date_collecte::date
+        FROM import_transit t
+        JOIN artistes a ON a.artist_id = t.artist_id AND a.plateforme = %s
+        ORDER BY a.id, t.date_collecte::date, t.date_collecte DESC
+        ON CONFLICT (artist_key, jour_collecte) DO UPDATE SET
+            followers = EXCLUDED.followers,
+            fans = EXCLUDED.fans,
+            popularite = EXCLUDED.popularite,
+            score_potentiel = EXCLUDED.score_potentiel,
+            engagement_rate = EXCLUDED.engagement_rate,
+            total_albums = EXCLUDED.total_albums,
+            date_collecte = EXCLUDED.date_collecte
+        WHERE EXCLUDED.date_collecte >= m.date_collecte
+    """, (plateforme,))
+    
+    return cursor.rowcount
+
+def find_data_path():
+    """Dossier des CSV des scrapers (lancé depuis scripts/ ou depuis la racine)"""
+    for path in ('../data', 'data'):
+        if os.path.exists(path):
+            return path
+    return None
+
+def import_csv_to_postgres():
+    """Importe les nouveaux CSV vers PostgreSQL (COPY + insertions ensemblistes)
+
+    Les fichiers déjà présents dans `imported_files` avec le même contenu
+    sont ignorés : le coût d'un import ne dépend que des données du jour.
+    """
+    data_path = find_data_path()
+    if data_path is None:
         print("ERROR Dossier 'data' introuvable")
         return
     
-    conn = get_connection()
-    cursor = conn.cursor()
+    import pandas as pd
     
-    # Import Spotify
-    spotify_files = glob.glob(f'{data_path}/spotify_emerging_artists_*.csv')
-    print(f"Fichiers Spotify trouves: {len(spotify_files)}")
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
     
-    spotify_count = 0
-    for file in spotify_files:
-        print(f"Import {file}...")
-        df = pd.read_csv(file)
-        print(f"  -> {len(df)} artistes dans le fichier")
+        manifest = load_import_manifest(cursor)
+        counts = {}
+        skipped = 0
+        total_time = 0.0
+    
+        for plateforme, source in CSV_SOURCES.items():
+            files = sorted(glob.glob(f"{data_path}/{source['pattern']}"))
+            print(f"Fichiers {plateforme} trouves: {len(files)}")
+            counts[plateforme] = 0
         
-        for idx, row in df.iterrows():
-            artist_id = generate_artist_id(row['nom'], 'Spotify')
+            for file in files:
+                fichier = os.path.basename(file)
+                taille = os.path.getsize(file)
+                modifie_le = os.path.getmtime(file)
+                previous = manifest.get(fichier)
             
-            try:
-                # Insert artiste
-                cursor.execute("""
-                    INSERT INTO artistes (artist_id, nom, plateforme, url, image_url)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (artist_id, plateforme) DO NOTHING
-                """, (
-                    artist_id,
-                    row['nom'],
-                    'Spotify',
-                    row.get('url_spotify', ''),
-                    ''
-                ))
-                
-                # Insert métriques
-                cursor.execute("""
-                    INSERT INTO metriques_historique 
-                    (artist_id, plateforme, followers, popularite, score_potentiel, date_collecte)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    artist_id,
-                    'Spotify',
-                    int(row.get('followers', 0)) if pd.notna(row.get('followers')) else 0,
-                    int(row.get('popularite', 0)) if pd.notna(row.get('popularite')) else 0,
-                    float(row.get('score_potentiel', 0)) if pd.notna(row.get('score_potentiel')) else 0,
-                    row.get('date_extraction', datetime.now())
-                ))
-                
-                spotify_count += 1
-                
-                if (idx + 1) % 20 == 0:
-                    print(f"  ... {idx + 1}/{len(df)} traites")
+                # Même taille et même date de modification : inutile de relire le fichier
+                if previous and previous[1] == taille and previous[2] == modifie_le:
+                    skipped += 1
+                    continue
+            
+                content_hash = file_sha256(file)
+                if previous and previous[0] == content_hash:
+                    # Fichier touché sans changement : on retient la nouvelle date
+                    cursor.execute("""
+                        UPDATE imported_files SET taille = %s, modifie_le = %s
+                        WHERE fichier = %s AND content_hash = %s
+                    """, (taille, modifie_le, fichier, content_hash))
                     conn.commit()
-                    
-            except Exception as e:
-                print(f"  ERREUR ligne {idx}: {e}")
-                conn.rollback()
-                continue
-        
-        conn.commit()
-        print(f"  OK Importe: {spotify_count} artistes Spotify")
-    
-    # Import Deezer
-    deezer_files = glob.glob(f'{data_path}/deezer_emerging_artists_*.csv')
-    print(f"Fichiers Deezer trouves: {len(deezer_files)}")
-    
-    deezer_count = 0
-    for file in deezer_files:
-        print(f"Import {file}...")
-        df = pd.read_csv(file)
-        print(f"  -> {len(df)} artistes dans le fichier")
-        
-        for idx, row in df.iterrows():
-            artist_id = generate_artist_id(row['nom'], 'Deezer')
+                    skipped += 1
+                    continue
             
-            try:
-                cursor.execute("""
-                    INSERT INTO artistes (artist_id, nom, plateforme, url, image_url)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (artist_id, plateforme) DO NOTHING
-                """, (
-                    artist_id,
-                    row['nom'],
-                    'Deezer',
-                    row.get('url_deezer', ''),
-                    ''
-                ))
-                
-                cursor.execute("""
-                    INSERT INTO metriques_historique 
-                    (artist_id, plateforme, fans, score_potentiel, engagement_rate, 
-                     total_albums, date_collecte)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    artist_id,
-                    'Deezer',
-                    int(row.get('fans', 0)) if pd.notna(row.get('fans')) else 0,
-                    float(row.get('score_potentiel', 0)) if pd.notna(row.get('score_potentiel')) else 0,
-                    float(row.get('engagement_rate', 0)) if pd.notna(row.get('engagement_rate')) else 0,
-                    int(row.get('total_albums', 0)) if pd.notna(row.get('total_albums')) else 0,
-                    row.get('date_extraction', datetime.now())
-                ))
-                
-                deezer_count += 1
+                print(f"Import {file}{' (modifie)' if previous else ''}...")
+                start = time.perf_counter()
+            
+                try:
+                    df = pd.read_csv(file)
+                    print(f"  -> {len(df)} artistes dans le fichier")
                 
-                if (idx + 1) % 20 == 0:
-                    print(f"  ... {idx + 1}/{len(df)} traites")
+                    staged = prepare_import_frame(df, plateforme)
+                    inserted = bulk_import_file(cursor, staged.itertuples(index=False, name=None), plateforme)
+                    record_imported_file(cursor, file, inserted, content_hash)
                     conn.commit()
-                    
-            except Exception as e:
-                print(f"  ERREUR ligne {idx}: {e}")
-                conn.rollback()
-                continue
-        
-        conn.commit()
-        print(f"  OK Importe: {deezer_count} artistes Deezer")
+                
+                except Exception as e:
+                    print(f"  ERREUR fichier {file}: {e}")
+                    conn.rollback()
+                    continue
+            
+                elapsed = time.perf_counter() - start
+                total_time += elapsed
+                counts[plateforme] += inserted
+                print(f"  OK Importe: {inserted} lignes en {elapsed:.2f}s "
+                      f"({inserted / max(elapsed, 1e-6):,.0f} lignes/s)")
     
-    cursor.close()
-    conn.close()
+        if sum(counts.values()):
+            refresh_latest_metrics(cursor)
+            conn.commit()
+        
+        cursor.close()
     
-    total = spotify_count + deezer_count
+    total = sum(counts.values())
     print(f"\nOK Import termine")
-    print(f"   - Spotify: {spotify_count} artistes")
-    print(f"   - Deezer: {deezer_count} artistes")
-    print(f"   - TOTAL: {total} artistes")
+    print(f"   - Fichiers deja importes (ignores): {skipped}")
+    for plateforme, count in counts.items():
+        print(f"   - {plateforme}: {count} artistes")
+    print(f"   - TOTAL: {total} artistes en {total_time:.2f}s "
+          f"({total / max(total_time, 1e-6):,.0f} lignes/s)")
 
 if __name__ == "__main__":
     print("Initialisation de la base PostgreSQL...")
@@ -0,0 +1,313 @@
+"""
+Migrations du schéma PostgreSQL existant
+Chaque migration est idempotente : relancée sur une base déjà migrée, elle ne fait rien.
+
+Usage: python db_migrations.py metriques|identites
+"""
+import glob
+import sys
+import time
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+import db_pool
+import database_postgres as db
+from metrics_rollup import UPSERT_AGGREGATE
+
+METRICS_COLUMNS = (
+    'id, artist_key, date_collecte, jour_collecte, followers, fans, popularite, '
+    'score_potentiel, engagement_rate, total_albums'
+)
+
+ROLLUP_COLUMNS = (
+    'resolution, artist_key, periode, nb_mesures, followers_min, followers_max, followers_dernier, '
+    'fans_min, fans_max, fans_dernier, score_moyen, date_derniere'
+)
+
+
+def _table_size(cursor, table):
+    """Taille totale (données + index, toutes partitions) en octets
+
+    pg_partition_tree() ne renvoie rien pour une table non partitionnée
+    (schéma d'origine) : sa taille est alors lue directement.
+    """
+    cursor.execute("""
+        SELECT COALESCE(
+            (SELECT SUM(pg_total_relation_size(relid)) FROM pg_partition_tree(%(table)s)),
+            pg_total_relation_size(%(table)s::regclass)
+        )
+    """, {'table': table})
+    return int(cursor.fetchone()[0] or 0)
+
+
+def _convert_platform_column(cursor):
+    """artistes.plateforme : VARCHAR -> type énuméré plateforme_code"""
+    cursor.execute("""
+        SELECT plateforme FROM artistes
+        UNION SELECT plateforme FROM metriques_historique_old
+    """)
+    existing = sorted(row[0] for row in cursor.fetchall())
+    db.create_platform_type(cursor, db.PLATFORMS + tuple(p for p in existing if p not in db.PLATFORMS))
+
+    # Mesures d'artistes absents de la table artistes : fiche minimale pour leur donner une clé
+    cursor.execute("""
+        INSERT INTO artistes (artist_id, nom, plateforme)
+        SELECT DISTINCT artist_id, artist_id, plateforme FROM metriques_historique_old
+        ON CONFLICT (artist_id, plateforme) DO NOTHING
+    """)
+    if cursor.rowcount:
+        print(f"   {cursor.rowcount} artistes ajoutés (présents seulement dans l'historique)")
+
+    cursor.execute("SELECT data_type FROM information_schema.columns "
+                   "WHERE table_name = 'artistes' AND column_name = 'plateforme'")
+    if cursor.fetchone()[0] != 'USER-DEFINED':
+        cursor.execute("""
+            ALTER TABLE artistes ALTER COLUMN plateforme
+            TYPE plateforme_code USING plateforme::plateforme_code
+        """)
+
+
+def _migrate_rollup_table(cursor):
+    """metriques_agregees (artist_id, plateforme) -> artist_key"""
+    if not db.table_exists(cursor, 'metriques_agregees'):
+        db.create_rollup_table(cursor)
+        return
+    if not db.has_column(cursor, 'metriques_agregees', 'artist_id'):
+        return
+
+    cursor.execute("ALTER TABLE metriques_agregees RENAME TO metriques_agregees_old")
+    cursor.execute("ALTER INDEX metriques_agregees_pkey RENAME TO metriques_agregees_old_pkey")
+    db.create_rollup_table(cursor)
+    cursor.execute(f"""
+        INSERT INTO metriques_agregees ({ROLLUP_COLUMNS})
+        SELECT g.resolution, a.id, g.periode, g.nb_mesures, g.followers_min, g.followers_max,
+               g.followers_dernier, g.fans_min, g.fans_max, g.fans_dernier, g.score_moyen,
+               g.date_derniere
+        FROM metriques_agregees_old g
+        JOIN artistes a ON a.artist_id = g.artist_id AND a.plateforme::text = g.plateforme
+    """)
+    cursor.execute("DROP TABLE metriques_agregees_old")
+
+
+def migrate_metrics_table():
+    """metriques_historique (anciens schémas) -> schéma courant
+
+    - partitions mensuelles sur jour_collecte, une mesure par artiste et par jour
+      (doublons compactés : la mesure la plus récente de la journée est gardée)
+    - artiste référencé par artist_key (artistes.id) au lieu de (artist_id, plateforme)
+    - artistes.plateforme en type énuméré, popularite / total_albums en SMALLINT
+    Tout se fait dans une transaction : en cas d'erreur la base reste intacte.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+
+        if db.metrics_schema_current(cursor):
+            print("✅ metriques_historique est déjà au schéma courant")
+            return
+
+        started = time.perf_counter()
+        cursor.execute("SELECT COUNT(*), MIN(date_collecte), MAX(date_collecte) FROM metriques_historique")
+        total, first, last = cursor.fetchone()
+        size_before = _table_size(cursor, 'metriques_historique')
+        print(f"📦 {total} mesures à migrer ({first} → {last}), {size_before / 1e6:.1f} Mo")
+
+        # La vue et les index portent les noms que la nouvelle table va reprendre
+        cursor.execute("DROP MATERIALIZED VIEW IF EXISTS latest_metrics")
+        if db.is_partitioned(cursor):
+            # Partitions mensuelles de l'ancien schéma : mêmes noms que les nouvelles
+            cursor.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'metriques_historique'::regclass
+            """)
+            for (name,) in cursor.fetchall():
+                cursor.execute(f"ALTER TABLE {name} RENAME TO {name}_old")
+        cursor.execute("ALTER TABLE metriques_historique RENAME TO metriques_historique_old")
+        cursor.execute("ALTER INDEX IF EXISTS metriques_historique_pkey RENAME TO metriques_historique_old_pkey")
+        for index in ('idx_metrics_artist_platform', 'idx_date_collecte', 'idx_date_collecte_brin',
+                      'idx_metrics_artist_platform_date', 'idx_metrics_artist_platform_jour'):
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+        _convert_platform_column(cursor)
+
+        db.create_metrics_table(cursor)
+        db.ensure_partitions(cursor, first, last)
+
+        # Dates nulles (anciens imports) : rangées à la date d'import la plus ancienne possible
+        cursor.execute(f"""
+            INSERT INTO metriques_historique ({METRICS_COLUMNS})
+            SELECT DISTINCT ON (a.id, o.date_collecte::date)
+                   o.id, a.id, o.date_collecte, o.date_collecte::date, o.followers, o.fans,
+                   o.popularite, o.score_potentiel, o.engagement_rate, o.total_albums
+            FROM (
+                SELECT id, artist_id, plateforme, COALESCE(date_collecte, %s) AS date_collecte,
+                       followers, fans, popularite, score_potentiel, engagement_rate, total_albums
+                FROM metriques_historique_old
+            ) o
+            JOIN artistes a ON a.artist_id = o.artist_id AND a.plateforme::text = o.plateforme
+            ORDER BY a.id, o.date_collecte::date, o.date_collecte DESC, o.id DESC
+        """, (first or datetime.now(),))
+        migrated = cursor.rowcount
+
+        # Toute ligne ancienne est soit migrée, soit un doublon d'une ligne migrée
+        cursor.execute("""
+            SELECT COUNT(DISTINCT (artist_id, plateforme, COALESCE(date_collecte, %s)::date))
+            FROM metriques_historique_old
+        """, (first or datetime.now(),))
+        if migrated != cursor.fetchone()[0]:
+            raise Exception(f"Migration incomplète : {migrated} lignes")
+
+        # La séquence de la nouvelle table reprend après le dernier id migré
+        cursor.execute("""
+            SELECT setval(pg_get_serial_sequence('metriques_historique', 'id'),
+                          COALESCE((SELECT MAX(id) FROM metriques_historique_old), 0) + 1, false)
+        """)
+        cursor.execute("DROP TABLE metriques_historique_old")
+
+        _migrate_rollup_table(cursor)
+        db.create_latest_metrics_view(cursor)
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM pg_inherits
+            WHERE inhparent = 'metriques_historique'::regclass
+        """)
+        partitions = cursor.fetchone()[0]
+        size_after = _table_size(cursor, 'metriques_historique')
+
+    print(f"✅ {migrated} mesures migrées dans {partitions} partitions, "
+          f"{total - migrated} doublons supprimés en {time.perf_counter() - started:.1f}s")
+    print(f"   Taille (données + index) : {size_before / 1e6:.1f} Mo → {size_after / 1e6:.1f} Mo")
+
+
+def load_archive_ids():
+    """{(plateforme, nom): ID natif} d'après les CSV archivés (le plus récent l'emporte)"""
+    import pandas as pd  # import différé : seule cette migration relit les archives
+
+    data_path = db.find_data_path()
+    archive = {}
+    if data_path is None:
+        return archive
+
+    for plateforme, source in db.CSV_SOURCES.items():
+        for file in sorted(glob.glob(f"{data_path}/{source['pattern']}")):
+            df = pd.read_csv(file).dropna(subset=['nom'])
+            ids = df[source['id']] if source['id'] in df else [None] * len(df)
+            urls = df[source['url']] if source['url'] in df else [None] * len(df)
+            for nom, native_id, url in zip(df['nom'], ids, urls):
+                native = db.parse_native_id(native_id, url)
+                if native:
+                    archive[(plateforme, nom)] = native
+    return archive
+
+
+def _merge_artist(cursor, source, target):
+    """Fusionne l'historique de l'artiste `source` dans `target`, puis supprime `source`"""
+    params = {'source': source, 'target': target}
+
+    # Même jour dans les deux historiques : la mesure la plus récente est gardée
+    cursor.execute("""
+        DELETE FROM metriques_historique s USING metriques_historique t
+        WHERE s.artist_key = %(source)s AND t.artist_key = %(target)s
+        AND t.jour_collecte = s.jour_collecte AND t.date_collecte >= s.date_collecte
+    """, params)
+    cursor.execute("""
+        DELETE FROM metriques_historique t USING metriques_historique s
+        WHERE t.artist_key = %(target)s AND s.artist_key = %(source)s
+        AND s.jour_collecte = t.jour_collecte
+    """, params)
+    cursor.execute("UPDATE metriques_historique SET artist_key = %(target)s WHERE artist_key = %(source)s",
+                   params)
+
+    cursor.execute(f"""
+        INSERT INTO metriques_agregees AS t ({ROLLUP_COLUMNS})
+        SELECT resolution, %(target)s, periode, nb_mesures, followers_min, followers_max,
+               followers_dernier, fans_min, fans_max, fans_dernier, score_moyen, date_derniere
+        FROM metriques_agregees WHERE artist_key = %(source)s
+        {UPSERT_AGGREGATE}
+    """, params)
+    cursor.execute("DELETE FROM metriques_agregees WHERE artist_key = %(source)s", params)
+    cursor.execute("DELETE FROM artistes WHERE id = %(source)s", params)
+
+
+def migrate_native_ids():
+    """artistes.artist_id : empreinte du nom -> ID natif de la plateforme
+
+    L'ID natif vient de l'URL de l'artiste, sinon des CSV archivés (même nom).
+    Un artiste renommé avait une fiche par nom : les historiques sont fusionnés
+    sous une seule clé (mesure la plus récente gardée pour un même jour).
+    Tout se fait dans une transaction.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+
+        if not db.metrics_schema_current(cursor):
+            print("⚠️ Ancien schéma : lancer d'abord python db_migrations.py metriques")
+            return
+
+        started = time.perf_counter()
+        cursor.execute("SELECT id, artist_id, nom, plateforme::text, url, date_ajout FROM artistes")
+        artists = cursor.fetchall()
+        by_native = {(artist_id, plateforme): key for key, artist_id, _, plateforme, _, _ in artists}
+        legacy = [a for a in artists if a[1] == db.generate_artist_id(a[2], a[3])]
+        if not legacy:
+            print("✅ Les artistes ont déjà leur ID natif")
+            return
+        print(f"📦 {len(legacy)} artistes identifiés par leur nom")
+
+        # ID natif de chaque ancienne fiche
+        groups = {}
+        archive = None
+        unresolved = 0
+        for key, artist_id, nom, plateforme, url, date_ajout in legacy:
+            native = db.parse_native_id(None, url)
+            if native is None:
+                if archive is None:
+                    archive = load_archive_ids()
+                native = archive.get((plateforme, nom))
+            if native is None:
+                unresolved += 1
+                continue
+            groups.setdefault((native, plateforme), []).append((date_ajout, key, artist_id))
+
+        # Une fiche par ID natif : celle qui le porte déjà, sinon la plus récente (nom actuel)
+        renames = []
+        merged = 0
+        for (native, plateforme), members in groups.items():
+            members.sort(reverse=True)
+            target = by_native.get((native, plateforme), members[0][1])
+            for _, key, artist_id in members:
+                if key != target:
+                    _merge_artist(cursor, key, target)
+                    merged += 1
+                cursor.execute("UPDATE alertes SET artist_id = %s WHERE artist_id = %s", (native, artist_id))
+            if by_native.get((native, plateforme)) != target:
+                renames.append((target, native))
+
+        cursor.execute("CREATE TEMP TABLE identites (artist_key INTEGER, native_id VARCHAR(255)) ON COMMIT DROP")
+        execute_values(cursor, "INSERT INTO identites VALUES %s", renames)
+        cursor.execute("""
+            UPDATE artistes a SET artist_id = i.native_id
+            FROM identites i WHERE a.id = i.artist_key
+        """)
+
+        db.refresh_latest_metrics(cursor)
+
+    print(f"✅ {len(renames)} artistes passés à l'ID natif, {merged} fiches fusionnées, "
+          f"{unresolved} sans ID retrouvé en {time.perf_counter() - started:.1f}s")
+
+
+MIGRATIONS = {
+    'metriques': migrate_metrics_table,
+    'partitions': migrate_metrics_table,  # ancien nom
+    'identites': migrate_native_ids,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(__doc__)
+        print(f"Migrations disponibles: {', '.join(MIGRATIONS)}")
+        sys.exit(1)
+
+    MIGRATIONS[sys.argv[1]]()
@@ -0,0 +1,195 @@
+"""
+Accès PostgreSQL partagé par les scripts et le dashboard
+Un pool de connexions par processus : la connexion (et sa poignée de main TLS
+vers la base hébergée) est ouverte une fois puis réutilisée, au lieu d'un
+psycopg2.connect() à chaque requête.
+
+Usage:
+    with db_pool.connection() as conn:
+        ...  # commit si tout s'est bien passé, rollback sinon
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Connexions gardées ouvertes entre deux requêtes / maximum simultané
+MIN_CONNECTIONS = 2
+MAX_CONNECTIONS = 8
+
+# Une connexion restée inactive plus longtemps est testée (SELECT 1) avant usage
+HEALTH_CHECK_AFTER = 60
+
+_database_url = None
+_pool = None
+_lock = threading.Lock()
+
+
+def get_database_url():
+    """URL de la base : .env / variable d'environnement, sinon secrets Streamlit
+
+    Résolue une seule fois par processus.
+    """
+    global _database_url
+    if _database_url:
+        return _database_url
+
+    try:
+        from dotenv import load_dotenv
+        # Charger depuis le dossier parent (racine du projet)
+        load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+    except ImportError:
+        pass
+
+    db_url = os.getenv("DATABASE_URL", "")
+    source = ".env / environnement"
+    if not db_url:
+        try:
+            import streamlit as st
+            db_url = st.secrets["DATABASE_URL"]
+            source = "secrets.toml"
+        except Exception:
+            pass
+
+    if not db_url:
+        print("\n❌ DATABASE_URL non trouvée !")
+        print("\n📋 SOLUTIONS :")
+        print("\n1️⃣ Vérifier .env dans le dossier racine")
+        print('   echo "DATABASE_URL=postgresql://..." > .env')
+        print("\n2️⃣ Ou vérifier .streamlit/secrets.toml")
+        print("   DATABASE_URL = \"postgresql://...\"")
+        raise Exception("DATABASE_URL non configurée")
+
+    print(f"✅ DATABASE_URL trouvée ({source})")
+    _database_url = db_url
+    return db_url
+
+
+class ConnectionPool:
+    """ThreadedConnectionPool + attente quand il est plein + contrôle de santé"""
+
+    def __init__(self, dsn, minconn=MIN_CONNECTIONS, maxconn=MAX_CONNECTIONS):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+        # ThreadedConnectionPool lève une erreur quand il est plein : on attend
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.maxconn = maxconn
+        self.stats = {
+            'checkouts': 0, 'in_use': 0, 'opened': 0, 'discarded': 0,
+            'health_checks': 0, 'wait_time': 0.0,
+        }
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            idle = time.monotonic() - self._last_used[conn]
+        if idle < HEALTH_CHECK_AFTER:
+            return True
+        self._count('health_checks')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Connexion saine du pool ; à rendre avec putconn()"""
+        started = time.monotonic()
+        self._slots.acquire()
+        self._count('wait_time', time.monotonic() - started)
+
+        try:
+            while True:
+                conn = self._pool.getconn()
+                with self._lock:
+                    known = conn in self._last_used
+                if not known:
+                    # Première utilisation de cette connexion : elle vient d'être ouverte
+                    self._count('opened')
+                    break
+                if self._healthy(conn):
+                    break
+                # Coupée par le serveur (redémarrage, timeout d'inactivité) : on la remplace
+                self._count('discarded')
+                with self._lock:
+                    self._last_used.pop(conn, None)
+                self._pool.putconn(conn, close=True)
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._count('checkouts')
+        self._count('in_use')
+        return conn
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            # Pas de transaction en cours dans une connexion rendue au pool
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        close = close or bool(conn.closed)
+        with self._lock:
+            self._last_used[conn] = time.monotonic()
+        self._pool.putconn(conn, close=close)
+        if conn.closed:
+            # Fermée par nous, ou par le pool au-delà de MIN_CONNECTIONS connexions inactives
+            with self._lock:
+                self._last_used.pop(conn, None)
+        self._count('in_use', -1)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            # Connexion perdue : elle est fermée au lieu de retourner dans le pool
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+def get_pool(dsn=None):
+    """Pool du processus, créé à la première utilisation"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ConnectionPool(dsn or get_database_url())
+        return _pool
+
+
+def connection():
+    """Raccourci : `with db_pool.connection() as conn:`"""
+    return get_pool().connection()
+
+
+def pool_stats():
+    return dict(get_pool().stats) if _pool is not None else {}
+
+
+def close_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
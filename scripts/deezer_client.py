@@ -0,0 +1,139 @@
+"""
+Client Deezer asynchrone pour JEK2 Records
+Garde plusieurs requêtes en vol et respecte le quota de l'API
+grâce à un seau à jetons (token bucket) partagé par toutes les requêtes
+"""
+import asyncio
+import time
+
+import aiohttp
+
+DEEZER_API_URL = 'https://api.deezer.com'
+
+# Quota Deezer : 50 requêtes / 5 secondes par IP.
+# 9 req/s + rafale de 5 => jamais plus de 50 requêtes sur une fenêtre de 5 s
+DEEZER_RATE_PER_SECOND = 9
+DEEZER_BURST = 5
+
+MAX_CONCURRENCY = 20
+REQUEST_TIMEOUT = 10
+MAX_RETRIES = 3
+
+# Code d'erreur renvoyé (avec un HTTP 200) quand le quota est dépassé
+QUOTA_EXCEEDED_CODE = 4
+
+
+class TokenBucket:
+    """Limiteur de débit global : `rate` jetons par seconde, `capacity` max"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class DeezerClient:
+    """Client API Deezer asynchrone (à utiliser avec `async with`)"""
+
+    def __init__(self, rate=DEEZER_RATE_PER_SECOND, burst=DEEZER_BURST,
+                 max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT, cache=None):
+        self.cache = cache
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self.session = None
+        self.stats = {'requests': 0, 'errors': 0, 'quota_retries': 0}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def _get(self, path, params=None):
+        """GET sur l'API (via le cache s'il est actif), renvoie le JSON ou None en cas d'échec"""
+        if self.cache is not None:
+            cached = self.cache.get(path, params)
+            if cached is not None:
+                return cached
+
+        data = await self._fetch(path, params)
+
+        if data is not None and self.cache is not None:
+            self.cache.set(path, params, data)
+
+        return data
+
+    async def _fetch(self, path, params=None):
+        """Requête réseau limitée par le seau à jetons"""
+        for attempt in range(MAX_RETRIES):
+            await self.bucket.acquire()
+
+            try:
+                async with self.semaphore:
+                    self.stats['requests'] += 1
+                    async with self.session.get(f'{DEEZER_API_URL}{path}', params=params) as response:
+                        if response.status != 200:
+                            self.stats['errors'] += 1
+                            return None
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.stats['errors'] += 1
+                return None
+
+            error = data.get('error') if isinstance(data, dict) else None
+            if not error:
+                return data
+
+            if error.get('code') == QUOTA_EXCEEDED_CODE:
+                # Quota dépassé malgré le limiteur (autre process sur la même IP)
+                self.stats['quota_retries'] += 1
+                await asyncio.sleep(1 + attempt)
+                continue
+
+            return None
+
+        self.stats['errors'] += 1
+        return None
+
+    async def search_artist_by_name(self, name):
+        """Recherche artiste par nom exact"""
+        data = await self._get('/search/artist', {'q': name, 'limit': 1})
+        artists = data.get('data', []) if data else []
+        return artists[0] if artists else None
+
+    async def get_artist_details(self, artist_id):
+        """Détails complets artiste"""
+        return await self._get(f'/artist/{artist_id}')
+
+    async def get_related_artists(self, artist_id):
+        """CLEF : Récupère les artistes similaires !"""
+        data = await self._get(f'/artist/{artist_id}/related', {'limit': 50})
+        return data.get('data', []) if data else []
+
+    async def get_artist_top_tracks(self, artist_id, limit=10):
+        data = await self._get(f'/artist/{artist_id}/top', {'limit': limit})
+        return data.get('data', []) if data else []
+
+    async def get_artist_albums(self, artist_id, limit=10):
+        data = await self._get(f'/artist/{artist_id}/albums', {'limit': limit})
+        return data.get('data', []) if data else []
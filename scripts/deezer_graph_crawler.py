@@ -0,0 +1,206 @@
+"""
+Exploration multi-sauts du graphe "related artists" de Deezer
+Frontière à priorité : un artiste pointé par beaucoup de seeds ou d'artistes
+validés est traité avant les autres ; arrêt sur budget de nœuds ou de temps
+"""
+import asyncio
+import heapq
+import itertools
+import time
+
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_NODES = 2000
+DEFAULT_TIME_BUDGET = 20 * 60  # secondes, sous le timeout de 30 min du scheduler
+BATCH_SIZE = 30
+
+
+class Frontier:
+    """File de priorité avec mise à jour paresseuse des scores"""
+
+    def __init__(self):
+        self.heap = []
+        self.nodes = {}       # {artist_id: {'artist', 'depth', 'score'}}
+        self.seen = set()     # déjà mis en file, traités ou rejetés
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _push_entry(self, artist_id):
+        node = self.nodes[artist_id]
+        heapq.heappush(self.heap, (-node['score'], node['depth'], next(self._counter), artist_id))
+
+    def add(self, artist, depth):
+        """Nouveau nœud ; renvoie False s'il a déjà été vu"""
+        artist_id = artist.get('id')
+        if artist_id in self.seen:
+            return False
+
+        self.seen.add(artist_id)
+        self.nodes[artist_id] = {'artist': artist, 'depth': depth, 'score': 1}
+        self._push_entry(artist_id)
+        return True
+
+    def bump(self, artist_id, depth):
+        """Un artiste de plus pointe vers ce nœud encore en file"""
+        node = self.nodes.get(artist_id)
+        if node is None:
+            return
+        node['score'] += 1
+        node['depth'] = min(node['depth'], depth)
+        self._push_entry(artist_id)
+
+    def pop(self):
+        while self.heap:
+            neg_score, depth, _, artist_id = heapq.heappop(self.heap)
+            node = self.nodes.get(artist_id)
+            # Entrée périmée (score mis à jour depuis) ou nœud déjà sorti
+            if node is None or -neg_score != node['score'] or depth != node['depth']:
+                continue
+            del self.nodes[artist_id]
+            return artist_id, node
+        return None
+
+    def pop_batch(self, size):
+        batch = []
+        while len(batch) < size:
+            item = self.pop()
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def snapshot(self):
+        """État sérialisable de la file"""
+        return [{'artist': node['artist'], 'depth': node['depth'], 'score': node['score']}
+                for node in self.nodes.values()]
+
+    def restore(self, snapshot, seen):
+        self.seen = set(seen)
+        for entry in snapshot:
+            artist_id = entry['artist'].get('id')
+            self.seen.add(artist_id)
+            self.nodes[artist_id] = {'artist': entry['artist'], 'depth': entry['depth'],
+                                     'score': entry['score']}
+            self._push_entry(artist_id)
+
+
+class GraphCrawler:
+    """Parcours best-first du graphe d'artistes similaires"""
+
+    def __init__(self, client, prefilter, validate, max_depth=DEFAULT_MAX_DEPTH,
+                 max_nodes=DEFAULT_MAX_NODES, time_budget=DEFAULT_TIME_BUDGET,
+                 batch_size=BATCH_SIZE, on_validated=None, on_batch=None):
+        self.client = client
+        self.prefilter = prefilter
+        self.validate = validate
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self.batch_size = batch_size
+        self.on_validated = on_validated  # reçoit chaque artiste validé (écriture en flux)
+        self.on_batch = on_batch          # appelé entre deux lots (état cohérent → checkpoint)
+
+        self.frontier = Frontier()
+        self.processed = 0
+        self.expanded = 0
+        self.validated = 0
+        self.validated_by_depth = {}
+        self.stop_reason = 'frontière vide'
+
+    def _discover(self, related, depth):
+        """Ajoute les artistes similaires à la frontière (pré-filtre appliqué une seule fois)"""
+        for artist in related:
+            artist_id = artist.get('id')
+            if artist_id in self.frontier.nodes:
+                self.frontier.bump(artist_id, depth)
+            elif artist_id not in self.frontier.seen:
+                if self.prefilter.check(artist) is None:
+                    self.frontier.add(artist, depth)
+                else:
+                    self.frontier.seen.add(artist_id)
+
+    async def _expand(self, nodes):
+        """Récupère les similaires des nœuds donnés [(artist_id, depth)]"""
+        nodes = [(artist_id, depth) for artist_id, depth in nodes if depth < self.max_depth]
+        related_lists = await asyncio.gather(
+            *(self.client.get_related_artists(artist_id) for artist_id, _ in nodes)
+        )
+        self.expanded += len(nodes)
+
+        for (_, depth), related in zip(nodes, related_lists):
+            self._discover(related, depth + 1)
+
+    def _budget_exhausted(self, started):
+        if self.processed >= self.max_nodes:
+            self.stop_reason = f'budget de {self.max_nodes} nœuds atteint'
+            return True
+        if self.time_budget and time.monotonic() - started >= self.time_budget:
+            self.stop_reason = f'budget de {self.time_budget:.0f}s atteint'
+            return True
+        return False
+
+    def state(self):
+        """État sérialisable du parcours (checkpoint)"""
+        return {
+            'frontier': self.frontier.snapshot(),
+            'seen': list(self.frontier.seen),
+            'processed': self.processed,
+            'expanded': self.expanded,
+            'validated': self.validated,
+            'validated_by_depth': self.validated_by_depth,
+        }
+
+    def restore(self, state):
+        self.frontier.restore(state['frontier'], state['seen'])
+        self.processed = state['processed']
+        self.expanded = state['expanded']
+        self.validated = state['validated']
+        self.validated_by_depth = {int(depth): count
+                                   for depth, count in state['validated_by_depth'].items()}
+
+    async def run(self, seed_ids, resumed=False):
+        """Explore à partir des seeds, renvoie le nombre d'artistes validés
+
+        Après `restore()` (resumed=True), la frontière reprend là où elle
+        s'était arrêtée au lieu de repartir des seeds.
+        """
+        started = time.monotonic()
+
+        if not resumed:
+            await self._expand([(seed_id, 0) for seed_id in seed_ids])
+
+        while len(self.frontier) and not self._budget_exhausted(started):
+            size = min(self.batch_size, self.max_nodes - self.processed)
+            batch = self.frontier.pop_batch(size)
+            results = await asyncio.gather(*(self.validate(artist_id) for artist_id, _ in batch))
+            self.processed += len(batch)
+
+            to_expand = []
+            for (artist_id, node), artist_info in zip(batch, results):
+                if not artist_info:
+                    continue
+                artist_info['profondeur'] = node['depth']
+                self.validated += 1
+                if self.on_validated:
+                    self.on_validated(artist_info)
+                self.validated_by_depth[node['depth']] = self.validated_by_depth.get(node['depth'], 0) + 1
+                to_expand.append((artist_id, node['depth']))
+
+            await self._expand(to_expand)
+
+            if self.on_batch:
+                self.on_batch()
+
+            if self.processed // 100 != (self.processed - len(batch)) // 100:
+                print(f"   {self.processed} nœuds traités | ✅ {self.validated} validés "
+                      f"| frontière: {len(self.frontier)}")
+
+        return self.validated
+
+    def print_report(self):
+        print(f"   • Arrêt: {self.stop_reason}")
+        print(f"   • Nœuds traités: {self.processed} | développés: {self.expanded} "
+              f"| restant en frontière: {len(self.frontier)}")
+        for depth in sorted(self.validated_by_depth):
+            print(f"   • Profondeur {depth}: {self.validated_by_depth[depth]} validés")
@@ -2,13 +2,22 @@
 Scraper Deezer V6 - Approche par LABELS et GRAPHE D'ARTISTES
 1. Partir d'artistes seed connus
 2. Utiliser l'API "related artists" de Deezer
-3. Explorer le graphe des artistes similaires
+3. Explorer le graphe des artistes similaires sur plusieurs sauts
+   (frontière à priorité, voir deezer_graph_crawler.py)
 """
-import requests
-import pandas as pd
+import argparse
+import asyncio
 from datetime import datetime
 import time
-import os
+
+from deezer_client import DeezerClient
+from http_cache import ResponseCache
+from filter_pipeline import FilterPipeline, merge_rejections
+from crawl_checkpoint import CrawlCheckpoint
+from artist_sink import open_sink, output_path
+from artist_report import print_deezer_report
+from deezer_graph_crawler import (GraphCrawler, DEFAULT_MAX_DEPTH,
+                                  DEFAULT_MAX_NODES, DEFAULT_TIME_BUDGET)
 
 # Configuration
 MIN_FANS = 1000
@@ -57,63 +66,6 @@ FORBIDDEN_NAMES = [
     'melissa m', 'mélissa m',  # Connue, R&B/Pop
 ]
 
-def search_artist_by_name(name):
-    """Recherche artiste par nom exact"""
-    try:
-        url = 'https://api.deezer.com/search/artist'
-        params = {'q': name, 'limit': 1}
-        
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            artists = data.get('data', [])
-            return artists[0] if artists else None
-        
-        return None
-    except:
-        return None
-
-def get_artist_details(artist_id):
-    """Détails complets artiste"""
-    try:
-        response = requests.get(f'https://api.deezer.com/artist/{artist_id}', timeout=10)
-        return response.json() if response.status_code == 200 else None
-    except:
-        return None
-
-def get_related_artists(artist_id):
-    """CLEF : Récupère les artistes similaires !"""
-    try:
-        url = f'https://api.deezer.com/artist/{artist_id}/related'
-        params = {'limit': 50}  # Max 50 artistes similaires
-        
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('data', [])
-        
-        return []
-    except:
-        return []
-
-def get_artist_top_tracks(artist_id, limit=10):
-    try:
-        response = requests.get(f'https://api.deezer.com/artist/{artist_id}/top', 
-                               params={'limit': limit}, timeout=10)
-        return response.json().get('data', []) if response.status_code == 200 else []
-    except:
-        return []
-
-def get_artist_albums(artist_id, limit=10):
-    try:
-        response = requests.get(f'https://api.deezer.com/artist/{artist_id}/albums',
-                               params={'limit': limit}, timeout=10)
-        return response.json().get('data', []) if response.status_code == 200 else []
-    except:
-        return []
-
 def is_forbidden(name):
     """Check blacklist"""
     name_lower = name.lower().strip()
@@ -234,124 +186,229 @@ def calculate_score(artist):
 
     return round(min(total, 100), 2)
 
-def main():
-    print("=" * 80)
-    print("🎤 JEK2 RECORDS - DEEZER V6 : EXPLORATION PAR GRAPHE")
-    print("🔍 Stratégie : Partir d'artistes connus → Explorer artistes similaires")
-    print("=" * 80)
+# Colonnes de la sortie (CSV / Parquet)
+OUTPUT_COLUMNS = [
+    'artist_id', 'nom', 'fans', 'total_albums', 'engagement_rate', 'radio',
+    'url_deezer', 'date_extraction', 'profondeur', 'score_potentiel'
+]
+
+# Appels restant à faire pour un candidat : détails + albums + top titres
+CALLS_PER_CANDIDATE = 3
+
+FILTER_LABELS = {
+    'seed_artist': 'Artistes SEED (trop connus)',
+    'blacklist': 'Blacklist',
+    'fans': 'Fans hors limite',
+    'albums': "Trop d'albums",
+    'activite': 'Pas actif',
+}
+
+def fans_in_range(fans):
+    return MIN_FANS <= fans <= MAX_FANS
+
+def build_filters(seed_ids_set):
+    """Pipelines de filtrage, du moins cher (payload related) au plus cher"""
+    # Étape A : payload /related (nom + nb_fan déjà connus, aucun appel)
+    prefilter = FilterPipeline('Pré-filtre related') \
+        .add_stage('seed_artist', lambda a: a.get('id') not in seed_ids_set, CALLS_PER_CANDIDATE) \
+        .add_stage('blacklist', lambda a: not is_forbidden(a.get('name', '')), CALLS_PER_CANDIDATE) \
+        .add_stage('fans', lambda a: 'nb_fan' not in a or fans_in_range(a['nb_fan']), CALLS_PER_CANDIDATE)
+    
+    # Étape B : détails complets (valeurs fraîches), évite albums + top titres
+    details_filter = FilterPipeline('Détails') \
+        .add_stage('blacklist', lambda d: not is_forbidden(d.get('name', '')), 2) \
+        .add_stage('fans', lambda d: fans_in_range(d.get('nb_fan', 0)), 2) \
+        .add_stage('albums', lambda d: d.get('nb_album', 0) <= 150, 2)
+    
+    # Étape C : albums récents, évite le top titres
+    activity_filter = FilterPipeline('Activité') \
+        .add_stage('activite', is_recent_activity, 1)
+    
+    return prefilter, details_filter, activity_filter
+
+async def validate_candidate(client, artist_id, details_filter, activity_filter):
+    """Récupère les détails d'un candidat et applique les filtres"""
+    details = await client.get_artist_details(artist_id)
     
-    print(f"\n📋 CONFIG:")
-    print(f"   • Fans: {MIN_FANS:,} - {MAX_FANS:,}")
-    print(f"   • Artistes seed: {len(SEED_ARTISTS)}")
-    print(f"   • Méthode: API 'related artists'")
+    if not details:
+        return None
+    
+    if details_filter.check(details):
+        return None
+    
+    albums = await client.get_artist_albums(artist_id)
     
+    if activity_filter.check(albums):
+        return None
+    
+    # Validé !
+    top_tracks = await client.get_artist_top_tracks(artist_id)
+    engagement = calculate_engagement(details, top_tracks)
+    
+    return {
+        'artist_id': artist_id,
+        'nom': details.get('name', ''),
+        'fans': details.get('nb_fan', 0),
+        'total_albums': details.get('nb_album', 0),
+        'engagement_rate': engagement,
+        'radio': details.get('radio', False),
+        'url_deezer': details.get('link', ''),
+        'date_extraction': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+async def resolve_seeds(client):
+    """ÉTAPE 1 : IDs Deezer des artistes seed"""
     print(f"\n🌱 ÉTAPE 1: Trouver les artistes SEED sur Deezer...")
     
     seed_ids = []
-    seed_found = []
     
-    for seed_name in SEED_ARTISTS:
-        artist = search_artist_by_name(seed_name)
+    seeds = await asyncio.gather(*(client.search_artist_by_name(name) for name in SEED_ARTISTS))
+    
+    for artist in seeds:
         if artist:
             artist_id = artist.get('id')
             artist_name = artist.get('name')
             seed_ids.append(artist_id)
-            seed_found.append(artist_name)
             print(f"  ✅ {artist_name} (ID: {artist_id})")
-        time.sleep(0.1)
     
     print(f"\n✅ {len(seed_ids)} artistes seed trouvés sur Deezer")
+    return seed_ids
+
+async def crawl(client, options, checkpoint):
+    """Étapes 1 à 3 : seeds → graphe des artistes similaires → validation (requêtes concurrentes)"""
+    state = checkpoint.load() if options.resume else None
+    
+    if state:
+        seed_ids = state['seed_ids']
+        print(f"\n♻️ REPRISE du checkpoint du {state['saved_at']} "
+              f"({state['crawler']['validated']} validés, {len(state['crawler']['frontier'])} en frontière)")
+        # Sorties de la collecte interrompue, quelles que soient les options actuelles
+        fmt, db_platform = state['format'], state.get('db_platform')
+        sink = open_sink(state['output'], fmt, OUTPUT_COLUMNS, marker=state['marker'], db_platform=db_platform)
+    else:
+        seed_ids = await resolve_seeds(client)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        fmt, db_platform = options.format, 'Deezer' if options.db else None
+        path = None if options.no_file else output_path('deezer_emerging_artists', fmt, timestamp)
+        sink = open_sink(path, fmt, OUTPUT_COLUMNS, db_platform=db_platform)
     
-    print(f"\n🕸️ ÉTAPE 2: Explorer les artistes SIMILAIRES (graphe)...")
+    print(f"\n🕸️ ÉTAPE 2+3: Explorer le graphe des artistes SIMILAIRES et valider...")
+    print(f"   Profondeur max: {options.depth} | budget: {options.max_nodes} nœuds, "
+          f"{options.time_budget:.0f}s")
     
-    all_candidates = {}  # {artist_id: artist_data}
+    # Créer un set des IDs seed pour exclusion rapide
+    seed_ids_set = set(seed_ids)
+    filters = build_filters(seed_ids_set)
+    prefilter, details_filter, activity_filter = filters
+    
+    async def validate(artist_id):
+        return await validate_candidate(client, artist_id, details_filter, activity_filter)
+    
+    def write_artist(artist_info):
+        # Le score ne dépend que de l'artiste : calculé dès la validation
+        artist_info['score_potentiel'] = calculate_score(artist_info)
+        sink.write(artist_info)
+    
+    def save_checkpoint():
+        # commit() d'abord : le fichier contient tout ce que le checkpoint déclare
+        checkpoint.maybe_save(lambda: {
+            'seed_ids': seed_ids,
+            'crawler': crawler.state(),
+            'filters': [pipeline.state() for pipeline in filters],
+            'output': sink.path,
+            'format': fmt,
+            'db_platform': db_platform,
+            'marker': sink.commit(),
+        })
+    
+    # Les filtres gratuits (payload related) sont appliqués à la découverte :
+    # seuls les survivants entrent dans la frontière et coûtent des appels
+    crawler = GraphCrawler(client, prefilter, validate, max_depth=options.depth,
+                           max_nodes=options.max_nodes, time_budget=options.time_budget,
+                           on_validated=write_artist, on_batch=save_checkpoint)
+    
+    if state:
+        crawler.restore(state['crawler'])
+        for pipeline, pipeline_state in zip(filters, state['filters']):
+            pipeline.restore(pipeline_state)
     
-    for i, seed_id in enumerate(seed_ids, 1):
-        if i % 10 == 0:
-            print(f"   {i}/{len(seed_ids)} seeds explorés | {len(all_candidates)} candidats uniques")
-        
-        # Récupérer artistes similaires
-        related = get_related_artists(seed_id)
-        
-        for artist in related:
-            artist_id = artist.get('id')
-            
-            if artist_id not in all_candidates:
-                all_candidates[artist_id] = artist
-        
-        time.sleep(0.2)
+    try:
+        validated = await crawler.run(seed_ids, resumed=bool(state))
+    except BaseException:
+        # Interruption : seul ce que déclare le dernier checkpoint est conservé
+        sink.abort()
+        raise
+    sink.close()
     
-    print(f"\n✅ {len(all_candidates)} artistes candidats uniques trouvés")
+    print(f"\n✅ Exploration terminée")
+    crawler.print_report()
     
-    print(f"\n🔎 ÉTAPE 3: Filtrage et validation...")
+    return sink.path, validated, filters
+
+async def run_crawl(options):
+    cache = ResponseCache()
+    checkpoint = CrawlCheckpoint('deezer_crawl')
     
-    artists_data = []
-    rejected = {'blacklist': 0, 'fans': 0, 'activite': 0, 'albums': 0, 'seed_artist': 0}
+    try:
+        async with DeezerClient(cache=cache) as client:
+            started = time.monotonic()
+            output, validated, filters = await crawl(client, options, checkpoint)
+            elapsed = time.monotonic() - started
+    finally:
+        cache.close()
+    
+    print(f"\n⏱️ Collecte: {elapsed:.1f}s | {client.stats['requests']} requêtes "
+          f"({client.stats['requests'] / max(elapsed, 0.001):.1f} req/s) | "
+          f"{client.stats['errors']} erreurs")
+    print(f"🗄️ Cache: {cache.stats['hits']} hits / {cache.stats['misses']} miss "
+          f"({cache.hit_rate():.0f}%) | {cache.stats['evicted']} évincées")
+    
+    # Collecte complète : plus rien à reprendre
+    checkpoint.clear()
+    
+    return output, validated, filters
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scraper Deezer V6 - exploration du graphe d'artistes")
+    parser.add_argument('--depth', type=int, default=DEFAULT_MAX_DEPTH,
+                        help="Nombre de sauts max depuis les seeds (défaut: %(default)s)")
+    parser.add_argument('--max-nodes', type=int, default=DEFAULT_MAX_NODES,
+                        help="Nombre max de candidats validés en détail (défaut: %(default)s)")
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET,
+                        help="Durée max de l'exploration en secondes (défaut: %(default)s)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprendre depuis le dernier checkpoint s'il existe")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Format de sortie des artistes validés (défaut: %(default)s)")
+    parser.add_argument('--db', action='store_true',
+                        help="Écrire aussi directement dans PostgreSQL (DATABASE_URL)")
+    parser.add_argument('--no-file', action='store_true',
+                        help="Pas de fichier de sortie (avec --db uniquement)")
+    options = parser.parse_args(argv)
+    if options.no_file and not options.db:
+        parser.error("--no-file n'a de sens qu'avec --db")
+    return options
+
+def main(argv=None):
+    options = parse_args(argv)
     
-    # Créer un set des IDs seed pour exclusion rapide
-    seed_ids_set = set(seed_ids)
+    print("=" * 80)
+    print("🎤 JEK2 RECORDS - DEEZER V6 : EXPLORATION PAR GRAPHE")
+    print("🔍 Stratégie : Partir d'artistes connus → Explorer artistes similaires")
+    print("=" * 80)
     
-    for i, (artist_id, artist) in enumerate(all_candidates.items(), 1):
-        if i % 100 == 0:
-            print(f"   {i}/{len(all_candidates)} | ✅ {len(artists_data)} validés")
-        
-        # NOUVEAU FILTRE : Exclure les artistes SEED (trop connus)
-        if artist_id in seed_ids_set:
-            rejected['seed_artist'] += 1
-            continue
-        
-        # Récupérer détails complets
-        details = get_artist_details(artist_id)
-        
-        if not details:
-            continue
-        
-        name = details.get('name', '')
-        fans = details.get('nb_fan', 0)
-        nb_albums = details.get('nb_album', 0)
-        
-        # Filtres
-        if is_forbidden(name):
-            rejected['blacklist'] += 1
-            continue
-        
-        if not (MIN_FANS <= fans <= MAX_FANS):
-            rejected['fans'] += 1
-            continue
-        
-        if nb_albums > 150:
-            rejected['albums'] += 1
-            continue
-        
-        albums = get_artist_albums(artist_id)
-        
-        if not is_recent_activity(albums):
-            rejected['activite'] += 1
-            continue
-        
-        # Validé !
-        top_tracks = get_artist_top_tracks(artist_id)
-        engagement = calculate_engagement(details, top_tracks)
-        
-        artist_info = {
-            'artist_id': artist_id,
-            'nom': name,
-            'fans': fans,
-            'total_albums': nb_albums,
-            'engagement_rate': engagement,
-            'radio': details.get('radio', False),
-            'url_deezer': details.get('link', ''),
-            'date_extraction': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        artists_data.append(artist_info)
-        
-        time.sleep(0.15)
+    print(f"\n📋 CONFIG:")
+    print(f"   • Fans: {MIN_FANS:,} - {MAX_FANS:,}")
+    print(f"   • Artistes seed: {len(SEED_ARTISTS)}")
+    print(f"   • Méthode: API 'related artists' (graphe, {options.depth} sauts max)")
+    
+    output, validated, filters = asyncio.run(run_crawl(options))
+    rejected = merge_rejections(*filters)
     
     print(f"\n{'='*80}")
     print(f"📊 RÉSULTATS")
     print(f"{'='*80}")
-    print(f"✅ Validés: {len(artists_data)}")
+    print(f"✅ Validés: {validated}")
     print(f"❌ Rejetés:")
     print(f"   • Artistes SEED (trop connus): {rejected['seed_artist']}")
     print(f"   • Blacklist: {rejected['blacklist']}")
@@ -359,67 +416,24 @@ def main():
     print(f"   • Trop d'albums: {rejected['albums']}")
     print(f"   • Pas actif: {rejected['activite']}")
     
-    if len(artists_data) == 0:
-        print("\n⚠️ Aucun artiste validé")
-        return
-    
-    # Calculer scores
-    for artist in artists_data:
-        artist['score_potentiel'] = calculate_score(artist)
-    
-    artists_data.sort(key=lambda x: x['score_potentiel'], reverse=True)
+    print(f"\n🧮 Filtrage par étapes:")
+    for pipeline in filters:
+        pipeline.print_report(FILTER_LABELS)
+    print(f"   → {sum(p.total_calls_saved() for p in filters)} appels API évités au total")
     
-    df = pd.DataFrame(artists_data)
+    if options.db and not output:
+        print(f"\n🐘 {validated} artistes écrits dans PostgreSQL (sans fichier)")
+    elif options.db:
+        print(f"\n🐘 {validated} artistes écrits dans PostgreSQL")
     
-    # Sauvegarder
-    os.makedirs('../data', exist_ok=True)
-    filename = f'../data/deezer_emerging_artists_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
-    
-    print(f"\n💾 {filename}")
-    
-    # TOP 30 AVEC SCORES BIEN VISIBLES
-    print(f"\n🏆 TOP 30 PAR SCORE DE POTENTIEL")
-    print("="*80)
-    for idx, row in df.head(30).iterrows():
-        print(f"{row['nom']:<40} {int(row['fans']):>8,} fans | Score: {row['score_potentiel']:>5.1f}")
-    
-    # TABLEAU COMPLET
-    print(f"\n" + "="*80)
-    print("📋 TABLEAU COMPLET (tous les artistes triés par score)")
-    print("="*80)
-    
-    column_order = [
-        'nom', 'fans', 'total_albums', 'engagement_rate', 
-        'score_potentiel', 'radio', 'url_deezer', 'date_extraction'
-    ]
-    df_display = df[column_order]
-    
-    pd.set_option('display.max_rows', None)
-    pd.set_option('display.width', None)
-    pd.set_option('display.max_colwidth', 50)
-    
-    print(df_display.to_string(index=False))
-    
-    print(f"\n📊 STATS:")
-    print(f"   Total: {len(df)}")
-    print(f"   Fans moyen: {df['fans'].mean():,.0f}")
-    print(f"   Score moyen: {df['score_potentiel'].mean():.1f}")
-    print(f"   Avec radio: {df['radio'].sum()}")
-    
-    # Vérifier quelques noms connus
-    test_names = ['Raplume', 'Guy2Bezbar', 'Luther', 'Zed', 'Lyonzon']
-    found_known = []
-    
-    for test_name in test_names:
-        if test_name.lower() in df['nom'].str.lower().values:
-            found_known.append(test_name)
-    
-    if found_known:
-        print(f"\n✅ Artistes émergents connus trouvés: {', '.join(found_known)}")
+    if output:
+        print(f"\n💾 {output}")
+        
+        # Classement + rapport : passe séparée sur la sortie
+        print_deezer_report(output)
     
-    print(f"\n💡 TIP: Ce scraper peut être relancé plusieurs fois pour")
-    print(f"   explorer plus profondément le graphe d'artistes similaires")
+    print(f"\n💡 TIP: --depth 3 pour explorer plus profondément le graphe d'artistes similaires")
+    print(f"   (--max-nodes / --time-budget bornent le nombre de requêtes)")
 
 if __name__ == "__main__":
     try:
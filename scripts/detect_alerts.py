@@ -2,90 +2,60 @@
 Détection des alertes de croissance pour JEK2 Records
 Analyse les variations de followers/fans et génère des alertes
 """
-import psycopg2
 from datetime import datetime, timedelta
-import os
 
-def get_connection():
-    """Connexion à la base PostgreSQL"""
-    db_url = os.getenv("DATABASE_URL", "")
-    if not db_url:
-        raise Exception("DATABASE_URL non configurée")
-    return psycopg2.connect(db_url)
+import alert_engine
+import db_pool
+import database_postgres as db
+from growth_metrics import refresh_growth_metrics
+
+# Première exécution : mesures collectées depuis la veille
+FIRST_RUN_LOOKBACK = timedelta(days=1)
 
 def detect_growth_alerts():
-    """Détecte les hausses importantes de followers/fans"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Détecte les hausses importantes de followers/fans (règles de alert_engine)
+
+    Incrémental : seuls les artistes collectés depuis le dernier passage
+    (watermark sur date_collecte) sont évalués, et leur croissance 1/7/30 jours
+    recalculée pour le dashboard (growth_metrics, même définition que les règles) ;
+    le coût suit le volume d'une collecte, pas l'historique.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        db.create_watermark_table(cursor)
     
-    # Récupérer les artistes avec historique
-    cursor.execute("""
-        WITH latest AS (
-            SELECT DISTINCT ON (artist_id, plateforme)
-                artist_id, plateforme, followers, fans, date_collecte,
-                COALESCE(followers, fans) as metric_value
-            FROM metriques_historique
-            ORDER BY artist_id, plateforme, date_collecte DESC
-        ),
-        previous AS (
-            SELECT DISTINCT ON (artist_id, plateforme)
-                artist_id, plateforme, 
-                COALESCE(followers, fans) as metric_value
-            FROM metriques_historique
-            WHERE date_collecte < NOW() - INTERVAL '1 day'
-            ORDER BY artist_id, plateforme, date_collecte DESC
-        )
-        SELECT 
-            a.nom as nom_artiste,
-            l.artist_id,
-            l.plateforme,
-            l.metric_value as current_value,
-            p.metric_value as previous_value,
-            ((l.metric_value - p.metric_value) * 100.0 / NULLIF(p.metric_value, 0)) as growth_percent
-        FROM latest l
-        JOIN previous p ON l.artist_id = p.artist_id AND l.plateforme = p.plateforme
-        JOIN artistes a ON l.artist_id = a.artist_id AND l.plateforme = a.plateforme
-        WHERE l.metric_value > p.metric_value
-        AND ((l.metric_value - p.metric_value) * 100.0 / NULLIF(p.metric_value, 0)) > 10
-        ORDER BY growth_percent DESC
-        LIMIT 20
-    """)
+        watermark = db.get_watermark(cursor, 'alertes_croissance', datetime.now() - FIRST_RUN_LOOKBACK)
+        cursor.execute("""
+            SELECT MAX(date_collecte) FROM metriques_historique
+            WHERE jour_collecte >= %(watermark)s::date AND date_collecte > %(watermark)s
+        """, {'watermark': watermark})
+        new_watermark = cursor.fetchone()[0]
     
-    results = cursor.fetchall()
+        if new_watermark is None:
+            print(f"✅ Aucune nouvelle mesure depuis {watermark:%Y-%m-%d %H:%M}")
+            cursor.close()
+            return
     
-    if not results:
-        print("✅ Aucune alerte de croissance détectée")
-        cursor.close()
-        conn.close()
-        return
+        refreshed = refresh_growth_metrics(cursor, since=watermark)
+        print(f"📊 Croissance 1/7/30 jours mise à jour pour {refreshed} artistes")
     
-    print(f"\n🔔 {len(results)} alertes de croissance détectées :")
+        alerts, inserted = alert_engine.run(conn, 'postgres', since=watermark)
     
-    # Insérer les alertes
-    for row in results:
-        nom, artist_id, plateforme, current, previous, growth = row
-        
-        message = f"📈 Croissance de {growth:.1f}% ({int(previous):,} → {int(current):,})"
-        
-        cursor.execute("""
-            INSERT INTO alertes (artist_id, nom_artiste, type_alerte, message, vu)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING
-        """, (
-            artist_id,
-            nom,
-            'croissance_followers',
-            message,
-            False
-        ))
-        
-        print(f"  • {nom} ({plateforme}): {message}")
+        # Avancé avec les alertes (même transaction) : un échec fait tout rejouer
+        db.set_watermark(cursor, 'alertes_croissance', new_watermark)
+        conn.commit()
+        cursor.close()
+    
+        if not alerts:
+            print("✅ Aucune alerte de croissance détectée")
+            return
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+        print(f"\n🔔 {len(alerts)} alertes détectées :")
+        for _, plateforme, nom, _, message, _, _ in alerts:
+            print(f"  • {nom} ({plateforme}): {message}")
     
-    print(f"\n✅ {len(results)} alertes enregistrées")
+        print(f"\n✅ {inserted} alertes enregistrées, "
+              f"{len(alerts) - inserted} déjà signalées (doublon ou délai de {alert_engine.COOLDOWN_DAYS} jours)")
 
 if __name__ == "__main__":
     try:
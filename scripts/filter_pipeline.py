@@ -0,0 +1,68 @@
+"""
+Pipeline de filtrage par étapes pour les scrapers JEK2 Records
+Les filtres les moins chers passent en premier ; chaque rejet compte
+les appels API qu'il a évités
+"""
+
+
+class FilterPipeline:
+    """Suite ordonnée d'étapes (clé, prédicat, appels économisés)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.checked = 0
+        self.rejected = {}
+        self.calls_saved = {}
+
+    def add_stage(self, key, predicate, calls_saved=0):
+        """`predicate(item)` renvoie True si l'élément passe l'étape"""
+        self.stages.append((key, predicate, calls_saved))
+        self.rejected.setdefault(key, 0)
+        self.calls_saved.setdefault(key, 0)
+        return self
+
+    def check(self, item):
+        """Renvoie la clé de l'étape qui rejette l'élément, None s'il passe tout"""
+        self.checked += 1
+
+        for key, predicate, calls_saved in self.stages:
+            if not predicate(item):
+                self.rejected[key] += 1
+                self.calls_saved[key] += calls_saved
+                return key
+
+        return None
+
+    def survivors(self, items):
+        return [item for item in items if self.check(item) is None]
+
+    def state(self):
+        """Compteurs sérialisables (checkpoint)"""
+        return {'checked': self.checked, 'rejected': self.rejected, 'calls_saved': self.calls_saved}
+
+    def restore(self, state):
+        self.checked = state.get('checked', 0)
+        self.rejected.update(state.get('rejected', {}))
+        self.calls_saved.update(state.get('calls_saved', {}))
+
+    def total_calls_saved(self):
+        return sum(self.calls_saved.values())
+
+    def print_report(self, labels=None):
+        labels = labels or {}
+        passed = self.checked - sum(self.rejected.values())
+        print(f"   [{self.name}] {self.checked} testés → {passed} retenus "
+              f"| {self.total_calls_saved()} appels API évités")
+        for key, _, _ in self.stages:
+            print(f"      • {labels.get(key, key)}: {self.rejected[key]} rejetés "
+                  f"({self.calls_saved[key]} appels évités)")
+
+
+def merge_rejections(*pipelines):
+    """Additionne les compteurs de rejet de plusieurs pipelines"""
+    totals = {}
+    for pipeline in pipelines:
+        for key, count in pipeline.rejected.items():
+            totals[key] = totals.get(key, 0) + count
+    return totals
@@ -0,0 +1,109 @@
+"""
+Croissance des artistes sur 1, 7 et 30 jours (table growth_metrics)
+Calculée en une passe (fonctions de fenêtre) sur l'historique récent ;
+lue par la détection d'alertes et par le dashboard.
+
+Usage: python growth_metrics.py   (recalcul complet)
+"""
+import time
+
+import db_pool
+import database_postgres as db
+
+# Fenêtres de croissance (jours) : colonnes croissance_<N>j de growth_metrics,
+# avec la tolérance (jours) accordée aux trous de collecte
+WINDOWS = {1: 1, 7: 2, 30: 5}
+
+# Historique lu : la plus grande fenêtre et sa tolérance
+LOOKBACK_DAYS = max(days + tolerance for days, tolerance in WINDOWS.items())
+
+
+def baseline_sql(value, partition, day, days, dialect='postgres'):
+    """Valeur de référence « `days` jours avant », commune à growth_metrics et alert_engine
+
+    Dernière mesure entre J-`days`-tolérance et J-`days` (cadre RANGE sur le
+    jour) : un trou de collecte est toléré, mais une mesure plus ancienne
+    ne sert pas de référence (NULL, pas de croissance).
+    """
+    oldest = days + WINDOWS[days]
+    if dialect == 'sqlite':
+        order, frame = f"julianday({day})", f"{oldest} PRECEDING AND {days} PRECEDING"
+    else:
+        order, frame = day, f"INTERVAL '{oldest} days' PRECEDING AND INTERVAL '{days} days' PRECEDING"
+    return f"""LAST_VALUE({value}) OVER (
+                   PARTITION BY {partition} ORDER BY {order}
+                   RANGE BETWEEN {frame}
+               )"""
+
+
+def _growth_select(artists_filter):
+    """Dernière mesure de chaque artiste et valeur connue 1/7/30 jours avant (voir baseline_sql)"""
+    lags = ',\n'.join(
+        f"               {baseline_sql('valeur', 'artist_key', 'jour_collecte', days)} AS valeur_{days}j"
+        for days in WINDOWS
+    )
+    growth = ',\n'.join(
+        f"""           valeur - valeur_{days}j,
+           ROUND((valeur - valeur_{days}j) * 100.0 / NULLIF(valeur_{days}j, 0), 2)"""
+        for days in WINDOWS
+    )
+    return f"""
+        SELECT DISTINCT ON (artist_key)
+           artist_key, jour_collecte, date_collecte, valeur,
+{growth}
+        FROM (
+            SELECT artist_key, jour_collecte, date_collecte, valeur,
+{lags}
+            FROM (
+                SELECT artist_key, jour_collecte, date_collecte,
+                       COALESCE(followers, fans) AS valeur
+                FROM metriques_historique
+                WHERE jour_collecte >= CURRENT_DATE - {LOOKBACK_DAYS}
+                {artists_filter}
+            ) h
+        ) w
+        ORDER BY artist_key, jour_collecte DESC
+    """
+
+
+def refresh_growth_metrics(cursor, since=None):
+    """Met à jour growth_metrics ; renvoie le nombre d'artistes recalculés
+
+    `since` : seuls les artistes ayant une mesure collectée après cette date
+    sont recalculés (détection d'alertes incrémentale). Sans `since` : tout.
+    """
+    db.create_growth_table(cursor)
+    columns = ', '.join(
+        f"croissance_{days}j, croissance_{days}j_pct" for days in WINDOWS
+    )
+    updates = ', '.join(
+        f"{column} = EXCLUDED.{column}"
+        for column in ['jour_collecte', 'date_collecte', 'valeur']
+        + [f"croissance_{days}j{suffix}" for days in WINDOWS for suffix in ('', '_pct')]
+    )
+
+    if since is None:
+        # DELETE plutôt que TRUNCATE : le dashboard lit l'ancienne version jusqu'au commit
+        cursor.execute("DELETE FROM growth_metrics")
+        artists_filter = ""
+    else:
+        artists_filter = """
+                AND artist_key IN (
+                    SELECT artist_key FROM metriques_historique
+                    WHERE jour_collecte >= %(since)s::date AND date_collecte > %(since)s
+                )"""
+
+    cursor.execute(f"""
+        INSERT INTO growth_metrics (artist_key, jour_collecte, date_collecte, valeur, {columns})
+        {_growth_select(artists_filter)}
+        ON CONFLICT (artist_key) DO UPDATE SET {updates}, date_calcul = CURRENT_TIMESTAMP
+    """, {'since': since})
+    return cursor.rowcount
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    with db_pool.connection() as conn:
+        count = refresh_growth_metrics(conn.cursor())
+    print(f"✅ Croissance 1/7/30 jours recalculée pour {count} artistes "
+          f"en {time.perf_counter() - started:.2f}s")
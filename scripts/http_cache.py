@@ -0,0 +1,131 @@
+"""
+Cache disque (SQLite) des réponses de l'API Deezer
+TTL par endpoint, taille plafonnée avec éviction LRU et compteurs hit/miss
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import urlencode
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'deezer_cache.db')
+MAX_ENTRIES = 50000
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# (pattern de chemin, TTL en secondes) - le premier qui correspond l'emporte
+ENDPOINT_TTLS = [
+    (re.compile(r'^/artist/\d+$'), 20 * HOUR),          # nb_fan change tous les jours
+    (re.compile(r'^/artist/\d+/top$'), 3 * DAY),
+    (re.compile(r'^/artist/\d+/albums$'), 7 * DAY),     # les albums bougent rarement
+    (re.compile(r'^/artist/\d+/related$'), 7 * DAY),
+    (re.compile(r'^/search/artist$'), 30 * DAY),
+]
+
+# Commit toutes les N écritures (un run interrompu garde ce qu'il a récupéré)
+COMMIT_EVERY = 50
+# Vérifier la taille du cache toutes les N écritures
+EVICTION_CHECK_EVERY = 200
+
+
+class ResponseCache:
+    """Stockage clé -> JSON avec expiration et éviction LRU"""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttls=ENDPOINT_TTLS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'writes': 0, 'evicted': 0}
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self.conn.commit()
+
+    def ttl_for(self, path):
+        """TTL de l'endpoint, None si l'endpoint n'est pas mis en cache"""
+        for pattern, ttl in self.ttls:
+            if pattern.match(path):
+                return ttl
+        return None
+
+    @staticmethod
+    def make_key(path, params=None):
+        return f"{path}?{urlencode(sorted((params or {}).items()))}"
+
+    def get(self, path, params=None):
+        """Renvoie la réponse en cache ou None (miss ou expirée)"""
+        if self.ttl_for(path) is None:
+            return None
+
+        key = self.make_key(path, params)
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT payload, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+
+        payload, expires_at = row
+        if expires_at < now:
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+
+        self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self.stats['hits'] += 1
+        return json.loads(payload)
+
+    def set(self, path, params, payload):
+        ttl = self.ttl_for(path)
+        if ttl is None:
+            return
+
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, payload, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (self.make_key(path, params), json.dumps(payload), now + ttl, now)
+        )
+        self.stats['writes'] += 1
+
+        if self.stats['writes'] % EVICTION_CHECK_EVERY == 0:
+            self.evict()
+        if self.stats['writes'] % COMMIT_EVERY == 0:
+            self.conn.commit()
+
+    def evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà du plafond"""
+        cursor = self.conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        evicted = cursor.rowcount
+
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self.conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
+            evicted += cursor.rowcount
+
+        self.stats['evicted'] += evicted
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups * 100 if lookups else 0.0
+
+    def close(self):
+        self.evict()
+        self.conn.commit()
+        self.conn.close()
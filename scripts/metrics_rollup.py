@@ -0,0 +1,273 @@
+"""
+Compactage de l'historique des métriques (niveaux de rétention)
+- mesures brutes : conservées RAW_RETENTION_DAYS jours
+- agrégats hebdomadaires : conservés WEEKLY_RETENTION_DAYS jours
+- agrégats mensuels : conservés indéfiniment
+
+La dernière mesure de chaque artiste n'est jamais compactée (latest_metrics).
+`load_history()` choisit la résolution selon la période demandée.
+
+Usage: python metrics_rollup.py [--raw-days 90] [--weekly-days 730]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import db_pool
+import database_postgres as db
+
+RAW_RETENTION_DAYS = 90
+WEEKLY_RETENTION_DAYS = 730
+
+# resolution -> unité de date_trunc
+RESOLUTIONS = {'semaine': 'week', 'mois': 'month'}
+
+# Fusion d'un lot avec un agrégat existant (période à cheval sur deux compactages)
+UPSERT_AGGREGATE = """
+    ON CONFLICT (resolution, artist_key, periode) DO UPDATE SET
+        followers_min = LEAST(t.followers_min, EXCLUDED.followers_min),
+        followers_max = GREATEST(t.followers_max, EXCLUDED.followers_max),
+        followers_dernier = CASE WHEN EXCLUDED.date_derniere >= t.date_derniere
+                                 THEN EXCLUDED.followers_dernier ELSE t.followers_dernier END,
+        fans_min = LEAST(t.fans_min, EXCLUDED.fans_min),
+        fans_max = GREATEST(t.fans_max, EXCLUDED.fans_max),
+        fans_dernier = CASE WHEN EXCLUDED.date_derniere >= t.date_derniere
+                            THEN EXCLUDED.fans_dernier ELSE t.fans_dernier END,
+        score_moyen = ROUND((COALESCE(t.score_moyen, EXCLUDED.score_moyen) * t.nb_mesures
+                             + COALESCE(EXCLUDED.score_moyen, t.score_moyen) * EXCLUDED.nb_mesures)
+                            / (t.nb_mesures + EXCLUDED.nb_mesures), 2),
+        nb_mesures = t.nb_mesures + EXCLUDED.nb_mesures,
+        date_derniere = GREATEST(t.date_derniere, EXCLUDED.date_derniere)
+"""
+
+
+# Mesures brutes d'un artiste depuis une date
+RAW_HISTORY = """
+    SELECT m.*, a.plateforme FROM metriques_historique m
+    JOIN artistes a ON a.id = m.artist_key
+    WHERE a.nom = %(nom)s AND m.jour_collecte >= %(since)s::date AND m.date_collecte >= %(since)s
+"""
+
+
+def _aggregate_select(unit, source):
+    """Agrégats par (artiste, période) des lignes brutes de `source`"""
+    return f"""
+        SELECT artist_key, date_trunc('{unit}', date_collecte)::date AS periode,
+               COUNT(*) AS nb_mesures,
+               MIN(followers) AS followers_min, MAX(followers) AS followers_max,
+               (ARRAY_AGG(followers ORDER BY date_collecte DESC))[1] AS followers_dernier,
+               MIN(fans) AS fans_min, MAX(fans) AS fans_max,
+               (ARRAY_AGG(fans ORDER BY date_collecte DESC))[1] AS fans_dernier,
+               ROUND(AVG(score_potentiel), 2) AS score_moyen,
+               MAX(date_collecte) AS date_derniere
+        FROM {source}
+    """
+
+
+def drop_empty_partitions(cursor, cutoff):
+    """Supprime les partitions mensuelles entièrement antérieures à `cutoff` et vides"""
+    if not db.is_partitioned(cursor):
+        return 0
+
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'metriques_historique'::regclass
+    """)
+    dropped = 0
+    for (name,) in cursor.fetchall():
+        try:
+            month = datetime.strptime(name[-7:], '%Y_%m')
+        except ValueError:
+            continue
+        if db._next_month(month) > cutoff:
+            continue
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"DROP TABLE {name}")
+            dropped += 1
+    return dropped
+
+
+def rollup_metrics(raw_days=RAW_RETENTION_DAYS, weekly_days=WEEKLY_RETENTION_DAYS):
+    """Compacte les mesures brutes de plus de `raw_days` jours ; renvoie le nombre de lignes compactées"""
+    started = time.perf_counter()
+    cutoff = datetime.combine(datetime.now().date() - timedelta(days=raw_days), datetime.min.time())
+
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        # Base initialisée avant l'ajout du compactage
+        db.create_rollup_table(cursor)
+
+        # La vue doit être à jour : les dernières mesures sont épargnées
+        db.refresh_latest_metrics(cursor)
+
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS rollup_lot
+            (LIKE metriques_historique) ON COMMIT DELETE ROWS
+        """)
+        cursor.execute("TRUNCATE rollup_lot")
+
+        # Lignes retirées de l'historique brut et agrégées dans la même transaction :
+        # chaque mesure est compactée exactement une fois
+        cursor.execute("""
+            WITH moved AS (
+                DELETE FROM metriques_historique m
+                WHERE m.jour_collecte < %s
+                AND NOT EXISTS (SELECT 1 FROM latest_metrics l WHERE l.id = m.id)
+                RETURNING m.*
+            )
+            INSERT INTO rollup_lot SELECT * FROM moved
+        """, (cutoff.date(),))
+        moved = cursor.rowcount
+
+        for resolution, unit in RESOLUTIONS.items():
+            cursor.execute(f"""
+                INSERT INTO metriques_agregees AS t
+                (resolution, artist_key, periode, nb_mesures,
+                 followers_min, followers_max, followers_dernier,
+                 fans_min, fans_max, fans_dernier, score_moyen, date_derniere)
+                SELECT %s, a.* FROM ({_aggregate_select(unit, 'rollup_lot')}
+                                     GROUP BY artist_key, periode) a
+                {UPSERT_AGGREGATE}
+            """, (resolution,))
+
+        # Niveau hebdomadaire expiré : seul le mensuel reste
+        cursor.execute("""
+            DELETE FROM metriques_agregees
+            WHERE resolution = 'semaine' AND periode < %s
+        """, (datetime.now() - timedelta(days=weekly_days),))
+        expired_weeks = cursor.rowcount
+
+        dropped = drop_empty_partitions(cursor, cutoff)
+
+    print(f"✅ Compactage: {moved} mesures brutes (avant {cutoff:%Y-%m-%d}) → agrégats hebdo/mensuels | "
+          f"{expired_weeks} semaines expirées | {dropped} partitions supprimées "
+          f"en {time.perf_counter() - started:.1f}s")
+    return moved
+
+
+def pick_resolution(days):
+    """Résolution adaptée à une période de `days` jours (None = tout l'historique)"""
+    if days is not None and days <= RAW_RETENTION_DAYS:
+        return 'brut'
+    if days is not None and days <= WEEKLY_RETENTION_DAYS:
+        return 'semaine'
+    return 'mois'
+
+
+def history_span_days(conn, nom_artiste):
+    """Ancienneté (jours) de la plus vieille mesure d'un artiste, brute ou agrégée ; None si aucune"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT LEAST(
+            (SELECT MIN(m.date_collecte) FROM metriques_historique m
+             JOIN artistes a ON a.id = m.artist_key WHERE a.nom = %(nom)s),
+            (SELECT MIN(g.periode) FROM metriques_agregees g
+             JOIN artistes a ON a.id = g.artist_key WHERE a.nom = %(nom)s)
+        )
+    """, {'nom': nom_artiste})
+    oldest = cursor.fetchone()[0]
+    cursor.close()
+    if oldest is None:
+        return None
+    return (datetime.now() - datetime.combine(oldest, datetime.min.time())).days + 1
+
+
+# Agrégats d'un niveau plus grossier, pour la partie de la période antérieure au
+# premier point du niveau plus fin `{finer}` (compactage avec --raw-days / --weekly-days)
+OLDER_AGGREGATES = """
+    SELECT g.periode::timestamp AS date_collecte, a.plateforme,
+           g.followers_dernier AS followers, g.fans_dernier AS fans, g.score_moyen AS score_potentiel
+    FROM metriques_agregees g
+    JOIN artistes a ON a.id = g.artist_key
+    WHERE a.nom = %(nom)s AND g.resolution = '{resolution}' AND g.date_derniere >= %(since)s
+    AND g.date_derniere < (SELECT COALESCE(MIN(date_collecte), 'infinity') FROM {finer})
+"""
+
+
+def load_history(conn, nom_artiste, days=None):
+    """Historique d'un artiste sur les `days` derniers jours, à la résolution adaptée
+
+    La résolution préférée suit la période réellement couverte (au plus
+    l'ancienneté de l'historique) : un artiste suivi depuis peu reste en
+    mesures brutes, même pour « Tout ». Elle ne dépend pas des durées de
+    rétention du dernier compactage : la partie de la période déjà compactée
+    au-delà est complétée par les agrégats hebdomadaires, puis mensuels.
+    Colonnes : date_collecte (début de période), plateforme, followers, fans,
+    score_potentiel, nom_artiste. Pour une résolution agrégée, les mesures
+    brutes encore présentes sont agrégées à la volée et fusionnées.
+    """
+    import pandas as pd  # import différé : seul le dashboard lit l'historique
+
+    span = history_span_days(conn, nom_artiste) or 0
+    resolution = pick_resolution(span if days is None else min(days, span))
+    since = datetime.now() - timedelta(days=days) if days is not None else datetime(1970, 1, 1)
+
+    if resolution == 'brut':
+        query = f"""
+            WITH brut AS (
+                SELECT date_collecte, plateforme, followers, fans, score_potentiel
+                FROM ({RAW_HISTORY}) m
+            ),
+            hebdo AS ({OLDER_AGGREGATES.format(resolution='semaine', finer='brut')}),
+            mensuel AS ({OLDER_AGGREGATES.format(
+                resolution='mois',
+                finer='(SELECT date_collecte FROM brut UNION ALL SELECT date_collecte FROM hebdo) f',
+            )})
+            SELECT * FROM brut
+            UNION ALL SELECT * FROM hebdo
+            UNION ALL SELECT * FROM mensuel
+            ORDER BY date_collecte
+        """
+    else:
+        unit = RESOLUTIONS[resolution]
+        # Première période complète : mêmes points avant et après compactage
+        since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        since = since.replace(day=1) if unit == 'month' else since - timedelta(days=since.weekday())
+        older = (f"UNION ALL {OLDER_AGGREGATES.format(resolution='mois', finer='agreges')}"
+                 if resolution == 'semaine' else '')
+        query = f"""
+            WITH points AS (
+                SELECT g.artist_key, g.periode, g.nb_mesures, g.followers_dernier, g.fans_dernier,
+                       g.score_moyen, g.date_derniere
+                FROM metriques_agregees g
+                JOIN artistes a ON a.id = g.artist_key
+                WHERE a.nom = %(nom)s AND g.resolution = %(resolution)s AND g.periode >= %(since)s
+                UNION ALL
+                SELECT r.artist_key, r.periode, r.nb_mesures, r.followers_dernier, r.fans_dernier,
+                       r.score_moyen, r.date_derniere
+                FROM ({_aggregate_select(unit, f'({RAW_HISTORY}) m')}
+                      GROUP BY artist_key, periode) r
+            ),
+            agreges AS (
+                SELECT p.periode::timestamp AS date_collecte, a.plateforme,
+                       (ARRAY_AGG(p.followers_dernier ORDER BY p.date_derniere DESC))[1] AS followers,
+                       (ARRAY_AGG(p.fans_dernier ORDER BY p.date_derniere DESC))[1] AS fans,
+                       ROUND(SUM(p.score_moyen * p.nb_mesures) / NULLIF(SUM(p.nb_mesures), 0), 2) AS score_potentiel
+                FROM points p
+                JOIN artistes a ON a.id = p.artist_key
+                GROUP BY a.plateforme, p.periode
+            )
+            SELECT * FROM agreges
+            {older}
+            ORDER BY date_collecte
+        """
+
+    history_df = pd.read_sql_query(query, conn, params={
+        'nom': nom_artiste, 'since': since, 'resolution': resolution,
+    })
+    history_df['nom_artiste'] = nom_artiste
+    history_df['score_potentiel'] = pd.to_numeric(history_df['score_potentiel'], errors='coerce')
+    return history_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compactage de l'historique des métriques")
+    parser.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS,
+                        help="Jours de mesures brutes conservées (défaut: %(default)s)")
+    parser.add_argument('--weekly-days', type=int, default=WEEKLY_RETENTION_DAYS,
+                        help="Jours d'agrégats hebdomadaires conservés (défaut: %(default)s)")
+    args = parser.parse_args()
+
+    rollup_metrics(args.raw_days, args.weekly_days)
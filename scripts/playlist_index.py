@@ -0,0 +1,69 @@
+"""
+Index persistant des playlists Spotify de découverte
+Clé : playlist_id -> snapshot_id + artistes extraits. Le snapshot_id ne change
+que quand la playlist est modifiée : une playlist inchangée n'est pas relue.
+Une playlist qui ne ressort plus des recherches depuis STALE_DAYS jours est
+retirée de l'index à l'enregistrement.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'spotify_playlist_index.json')
+
+STALE_DAYS = 30
+
+
+class PlaylistIndex:
+    """{playlist_id: {'snapshot_id', 'name', 'artists': [[id, nom], ...], 'updated_at', 'seen_at'}}"""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.playlists = {}
+        self.stats = {'unchanged': 0, 'refreshed': 0, 'pruned': 0}
+
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.playlists = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Index des playlists illisible, reconstruit: {e}")
+
+    def get(self, playlist_id, snapshot_id):
+        """Artistes de la playlist si son snapshot n'a pas changé, sinon None"""
+        entry = self.playlists.get(playlist_id)
+        if entry and snapshot_id and entry['snapshot_id'] == snapshot_id:
+            entry['seen_at'] = datetime.now().isoformat(timespec='seconds')
+            self.stats['unchanged'] += 1
+            return entry['artists']
+        return None
+
+    def put(self, playlist_id, snapshot_id, name, artists):
+        now = datetime.now().isoformat(timespec='seconds')
+        self.playlists[playlist_id] = {
+            'snapshot_id': snapshot_id,
+            'name': name,
+            'artists': artists,
+            'updated_at': now,
+            'seen_at': now,
+        }
+        self.stats['refreshed'] += 1
+
+    def prune(self, stale_days=STALE_DAYS):
+        """Retire les playlists non revues depuis `stale_days` jours"""
+        cutoff = (datetime.now() - timedelta(days=stale_days)).isoformat(timespec='seconds')
+        stale = [
+            playlist_id for playlist_id, entry in self.playlists.items()
+            if entry.get('seen_at', entry['updated_at']) < cutoff
+        ]
+        for playlist_id in stale:
+            del self.playlists[playlist_id]
+        self.stats['pruned'] += len(stale)
+
+    def save(self):
+        self.prune()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.playlists, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
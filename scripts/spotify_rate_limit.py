@@ -0,0 +1,114 @@
+"""
+Limiteur partagé pour les appels Spotify faits depuis plusieurs threads
+Un 429 reçu par un worker bloque tous les autres pendant le Retry-After ;
+les erreurs transitoires sont réessayées avec un backoff exponentiel + jitter.
+Le client spotipy doit utiliser `build_session()` : sans retries HTTP internes,
+chaque 429 / 5xx remonte ici au premier essai.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from spotipy.exceptions import SpotifyException
+from urllib3.util.retry import Retry
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+# Retry-After plus long : on abandonne (ThrottledError) plutôt que de bloquer
+# toute la collecte, Spotify pouvant demander plusieurs heures d'attente
+MAX_RETRY_AFTER = 120
+
+
+class ThrottledError(Exception):
+    """Appel abandonné après épuisement des tentatives (throttling / panne)"""
+
+
+class SharedBackoff:
+    """Fenêtre de blocage commune à tous les workers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.blocked_until = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Remise à zéro des compteurs (une collecte = un rapport)"""
+        self.stats = {'calls': 0, 'throttled': 0, 'retries': 0}
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self.blocked_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def block(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.stats['throttled'] += 1
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def build_session():
+    """Session HTTP sans retries internes (urllib3 respecte sinon Retry-After dans chaque thread)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=Retry(total=0, read=False, respect_retry_after_header=False))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _retry_after(exception):
+    """Retry-After (secondes) d'un 429, None si l'en-tête est absent"""
+    headers = getattr(exception, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _jittered_delay(attempt):
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def call_with_retry(backoff, func, *args, max_attempts=MAX_ATTEMPTS, **kwargs):
+    """Appelle `func` en respectant la fenêtre partagée ; lève ThrottledError en dernier recours"""
+    for attempt in range(max_attempts):
+        backoff.wait()
+        backoff.count('calls')
+
+        try:
+            return func(*args, **kwargs)
+
+        except SpotifyException as e:
+            if e.http_status == 429:
+                retry_after = _retry_after(e)
+                if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+                    backoff.count('throttled')
+                    raise ThrottledError(f"{getattr(func, '__name__', func)}: "
+                                         f"Retry-After de {retry_after}s (> {MAX_RETRY_AFTER}s)") from e
+                if retry_after is not None:
+                    # Quota dépassé : tout le monde attend, pas seulement ce worker
+                    backoff.block(retry_after + random.uniform(0, 1))
+                else:
+                    time.sleep(_jittered_delay(attempt))
+            elif e.http_status >= 500:
+                time.sleep(_jittered_delay(attempt))
+            else:
+                raise
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            time.sleep(_jittered_delay(attempt))
+
+        backoff.count('retries')
+
+    raise ThrottledError(f"{getattr(func, '__name__', func)}: {max_attempts} tentatives épuisées")
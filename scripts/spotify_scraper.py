@@ -1,9 +1,18 @@
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
-import pandas as pd
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from crawl_checkpoint import CrawlCheckpoint
+from filter_pipeline import FilterPipeline
+from playlist_index import PlaylistIndex
+from spotify_rate_limit import SharedBackoff, ThrottledError, build_session, call_with_retry
+from artist_sink import open_sink, output_path
+from artist_report import print_spotify_report
+
 # Configuration
 try:
     from config import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
@@ -20,34 +29,97 @@ MIN_POPULARITY = 10
 MAX_POPULARITY = 60
 MIN_RECENT_RELEASE_MONTHS = 24
 
+# sp.artists() accepte jusqu'à 50 IDs par requête
+HYDRATION_BATCH_SIZE = 50
+
+# Workers pour l'enrichissement par artiste (albums + top titres)
+ENRICH_WORKERS = 8
+
+# Colonnes de la sortie (CSV / Parquet)
+OUTPUT_COLUMNS = [
+    'id', 'nom', 'followers', 'popularite', 'avg_track_popularity',
+    'growth_indicator', 'score_potentiel', 'last_release_date',
+    'genres', 'url_spotify', 'date_extraction'
+]
+
 # Mots à exclure
 EXCLUDE_KEYWORDS = [
     'official', 'records', 'music', 'label', 'compilation', 
     'various artists', 'soundtrack', 'ost', 'tribute'
 ]
 
-# Authentification
-auth_manager = SpotifyClientCredentials(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET
-)
-sp = spotipy.Spotify(auth_manager=auth_manager)
+SEARCH_QUERIES = [
+    'rap français nouveauté découverte',
+    'hip hop français émergent',
+    'rap français underground indépendant',
+    'nouveauté rap france',
+    'découverte hip hop français',
+    'artiste émergent rap français',
+    'nouveau rappeur français',
+    'rap français indé',
+    'rnb français nouveauté',
+    'soul français émergent'
+]
+
+GENRES = ['rap français', 'hip hop français', 'rnb français']
+
+# Nombre maximum de candidats analysés par collecte
+MAX_CANDIDATES = 1000
+
+# Client créé au premier appel puis réutilisé (jeton et connexions HTTP)
+# par toutes les collectes du même processus
+_client = None
+_client_lock = threading.Lock()
+backoff = SharedBackoff()
+
+def get_client():
+    """Client Spotify authentifié, créé à la première utilisation"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            auth_manager = SpotifyClientCredentials(
+                client_id=CLIENT_ID,
+                client_secret=CLIENT_SECRET
+            )
+            # Aucun retry HTTP interne : 429 et 5xx remontent au limiteur partagé
+            # (spotify_rate_limit), qui fait patienter tous les workers
+            _client = spotipy.Spotify(auth_manager=auth_manager, requests_session=build_session())
+        return _client
 
 def is_valid_artist(artist_name):
     """Vérifie si le nom de l'artiste n'est pas une compilation ou un label"""
     name_lower = artist_name.lower()
     return not any(keyword in name_lower for keyword in EXCLUDE_KEYWORDS)
 
-def search_emerging_artists_from_playlists(genres, queries):
+def fetch_playlist_artists(playlist_id):
+    """Tous les artistes d'une playlist (toutes les pages de 100 titres) : [[id, nom], ...]"""
+    artists = []
+    page = call_with_retry(backoff, get_client().playlist_tracks, playlist_id, limit=100)
+    
+    while page:
+        for item in page['items']:
+            if not item.get('track') or not item['track'].get('artists'):
+                continue
+            
+            for artist in item['track']['artists']:
+                if artist['id']:
+                    artists.append([artist['id'], artist['name']])
+        
+        page = call_with_retry(backoff, get_client().next, page) if page.get('next') else None
+    
+    return artists
+
+def search_emerging_artists_from_playlists(genres=GENRES, queries=SEARCH_QUERIES):
     """Recherche ciblée dans des playlists de découverte"""
     all_artists = []
     seen_ids = set()
+    index = PlaylistIndex()
     
     for query in queries:
         print(f"\nRecherche: '{query}'")
         
         try:
-            playlists = sp.search(q=query, type='playlist', limit=15, market='FR')
+            playlists = call_with_retry(backoff, get_client().search, q=query, type='playlist', limit=15, market='FR')
             
             for playlist in playlists['playlists']['items']:
                 if not playlist:
@@ -57,28 +129,26 @@ def search_emerging_artists_from_playlists(genres, queries):
                 playlist_id = playlist['id']
                 
                 if any(word in playlist_name for word in ['nouveauté', 'découverte', 'émergent', 'underground', 'indé', 'nouveau', 'fresh', 'upcoming']):
-                    print(f"  Playlist: {playlist['name']} ({playlist.get('tracks', {}).get('total', 0)} tracks)")
+                    snapshot_id = playlist.get('snapshot_id')
+                    playlist_artists = index.get(playlist_id, snapshot_id)
                     
-                    try:
-                        tracks = sp.playlist_tracks(playlist_id, limit=100)
+                    if playlist_artists is None:
+                        print(f"  Playlist: {playlist['name']} ({playlist.get('tracks', {}).get('total', 0)} tracks)")
                         
-                        for item in tracks['items']:
-                            if not item.get('track') or not item['track'].get('artists'):
-                                continue
-                            
-                            for artist in item['track']['artists']:
-                                artist_id = artist['id']
-                                artist_name = artist['name']
-                                
-                                if artist_id and artist_id not in seen_ids and is_valid_artist(artist_name):
-                                    seen_ids.add(artist_id)
-                                    all_artists.append({'id': artist_id, 'name': artist_name})
+                        try:
+                            playlist_artists = fetch_playlist_artists(playlist_id)
+                        except Exception as e:
+                            print(f"    Erreur playlist: {str(e)}")
+                            continue
                         
-                        time.sleep(0.5)
+                        index.put(playlist_id, snapshot_id, playlist['name'], playlist_artists)
+                    else:
+                        print(f"  Playlist: {playlist['name']} (inchangée, depuis l'index)")
                     
-                    except Exception as e:
-                        print(f"    Erreur playlist: {str(e)}")
-                        continue
+                    for artist_id, artist_name in playlist_artists:
+                        if artist_id not in seen_ids and is_valid_artist(artist_name):
+                            seen_ids.add(artist_id)
+                            all_artists.append({'id': artist_id, 'name': artist_name})
             
             time.sleep(1)
             
@@ -86,12 +156,16 @@ def search_emerging_artists_from_playlists(genres, queries):
             print(f"  Erreur recherche '{query}': {str(e)}")
             continue
     
+    index.save()
+    print(f"\nPlaylists: {index.stats['unchanged']} inchangées (index), {index.stats['refreshed']} relues, "
+          f"{index.stats['pruned']} retirées de l'index")
+    
     return all_artists
 
 def get_artist_recent_albums(artist_id):
     """Vérifie les sorties récentes de l'artiste"""
     try:
-        albums = sp.artist_albums(artist_id, limit=10, album_type='album,single')
+        albums = call_with_retry(backoff, get_client().artist_albums, artist_id, limit=10, album_type='album,single')
         
         if not albums['items']:
             return False, None
@@ -116,25 +190,53 @@ def get_artist_recent_albums(artist_id):
         except:
             return False, None
             
+    except ThrottledError:
+        raise
     except Exception as e:
         return False, None
 
-def get_artist_details(artist_id):
-    """Récupère les détails complets d'un artiste avec filtres stricts"""
-    try:
-        artist = sp.artist(artist_id)
-        
-        popularity = artist['popularity']
-        if not (MIN_POPULARITY <= popularity <= MAX_POPULARITY):
-            return None
+def build_hydration_filter():
+    """Filtres appliqués au lot entier, avant tout appel par artiste"""
+    # Un rejet évite les 2 appels d'enrichissement (albums + top titres)
+    return FilterPipeline('Hydratation') \
+        .add_stage('popularity', lambda a: MIN_POPULARITY <= a['popularity'] <= MAX_POPULARITY, 2) \
+        .add_stage('followers', lambda a: MIN_FOLLOWERS <= a['followers']['total'] <= MAX_FOLLOWERS, 2)
+
+def hydrate_artists(artist_ids, hydration_filter, lost):
+    """Récupère les artistes par lots de 50 (sp.artists) et garde ceux qui passent les filtres
+
+    Les IDs d'un lot abandonné pour cause de throttling sont ajoutés à `lost`.
+    """
+    survivors = []
+    
+    for start in range(0, len(artist_ids), HYDRATION_BATCH_SIZE):
+        batch = artist_ids[start:start + HYDRATION_BATCH_SIZE]
         
-        followers = artist['followers']['total']
-        if not (MIN_FOLLOWERS <= followers <= MAX_FOLLOWERS):
-            return None
+        try:
+            artists = call_with_retry(backoff, get_client().artists, batch)['artists']
+        except ThrottledError as e:
+            print(f"  Lot perdu (throttling): {str(e)}")
+            lost.extend(batch)
+            continue
+        except Exception as e:
+            print(f"  Erreur lot d'artistes: {str(e)}")
+            continue
         
+        survivors.extend(hydration_filter.survivors(artist for artist in artists if artist))
+    
+    return survivors
+
+def enrich_artist(artist):
+    """Sorties récentes + top titres d'un artiste déjà hydraté et filtré
+
+    Exécuté dans un worker : renvoie (artist_data, None) ou (None, motif du rejet).
+    """
+    artist_id = artist['id']
+    
+    try:
         is_recent, last_release = get_artist_recent_albums(artist_id)
         if not is_recent:
-            return None
+            return None, 'no_recent_release'
         
         genres = artist['genres']
         genre_keywords = ['rap', 'hip hop', 'hip-hop', 'rnb', 'r&b', 'soul', 'trap', 'drill']
@@ -143,11 +245,12 @@ def get_artist_details(artist_id):
             for genre in genres
         ) if genres else False
         
-        top_tracks = sp.artist_top_tracks(artist_id, country='FR')
+        top_tracks = call_with_retry(backoff, get_client().artist_top_tracks, artist_id, country='FR')
         
         if not top_tracks['tracks']:
-            return None
+            return None, 'other'
         
+        popularity = artist['popularity']
         avg_popularity = sum([track['popularity'] for track in top_tracks['tracks']]) / len(top_tracks['tracks'])
         
         growth_indicator = popularity - avg_popularity
@@ -155,7 +258,7 @@ def get_artist_details(artist_id):
         artist_data = {
             'id': artist['id'],
             'nom': artist['name'],
-            'followers': followers,
+            'followers': artist['followers']['total'],
             'genres': ', '.join(genres) if genres else 'Non spécifié',
             'popularite': popularity,
             'avg_track_popularity': round(avg_popularity, 2),
@@ -166,11 +269,13 @@ def get_artist_details(artist_id):
             'date_extraction': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        return artist_data
+        return artist_data, None
         
+    except ThrottledError:
+        return None, 'throttled'
     except Exception as e:
         print(f"  Erreur artiste {artist_id}: {str(e)}")
-        return None
+        return None, 'other'
 
 def calculate_potential_score(artist):
     """Calcule un score de potentiel avec des critères affinés"""
@@ -210,104 +315,187 @@ def calculate_potential_score(artist):
     
     return round(total_score, 2)
 
-# Programme principal
-print("JEK2 RECORDS - TALENT SCOUTING SPOTIFY V2")
-print("Recherche ciblée d'artistes émergents (< 50K followers)")
-print("=" * 70)
-
-search_queries = [
-    'rap français nouveauté découverte',
-    'hip hop français émergent',
-    'rap français underground indépendant',
-    'nouveauté rap france',
-    'découverte hip hop français',
-    'artiste émergent rap français',
-    'nouveau rappeur français',
-    'rap français indé',
-    'rnb français nouveauté',
-    'soul français émergent'
-]
-
-genres = ['rap français', 'hip hop français', 'rnb français']
 
-print("\nETAPE 1: Recherche d'artistes émergents...")
-artists_list = search_emerging_artists_from_playlists(genres, search_queries)
-print(f"\n{len(artists_list)} artistes candidats trouvés")
+def discover(state=None):
+    """Étape 1 : candidats issus des playlists de découverte (ou du checkpoint)"""
+    if state:
+        print(f"\nREPRISE du checkpoint du {state['saved_at']}")
+        return state['candidates']
+    
+    print("\nETAPE 1: Recherche d'artistes émergents...")
+    return search_emerging_artists_from_playlists()
 
-print("\nETAPE 2: Analyse détaillée et filtrage strict...")
-print("Cela peut prendre plusieurs minutes...")
-print("   Filtres actifs:")
-print(f"   • Popularité: {MIN_POPULARITY}-{MAX_POPULARITY}")
-print(f"   • Followers: {MIN_FOLLOWERS:,}-{MAX_FOLLOWERS:,}")
-print(f"   • Activité récente: < {MIN_RECENT_RELEASE_MONTHS} mois")
-print()
+def persist(sink, artist_data):
+    """Score final puis écriture dans la sortie"""
+    artist_data['score_potentiel'] = calculate_potential_score(artist_data)
+    sink.write(artist_data)
 
-artists_details = []
-rejected_count = {
-    'popularity': 0,
-    'followers': 0,
-    'no_recent_release': 0,
-    'other': 0
-}
+def run_collection(resume=False, fmt='csv', report=True, db=False, file=True):
+    """Collecte complète : découverte, hydratation, enrichissement, score, écriture
 
-for i, artist in enumerate(artists_list[:1000], 1):
-    if i % 25 == 0:
-        print(f"  Progression: {i}/{min(1000, len(artists_list))} | Validés: {len(artists_details)}")
+    Peut être appelée plusieurs fois dans le même processus (scheduler) :
+    le client Spotify et ses connexions sont réutilisés d'une collecte à l'autre.
+    `db` : écriture directe dans PostgreSQL ; `file=False` : sans fichier de sortie.
+    Renvoie un résumé : {'output', 'validated', 'rejected', 'throttled_ids'}.
+    """
+    checkpoint = CrawlCheckpoint('spotify_scraper')
+    state = checkpoint.load() if resume else None
+    backoff.reset_stats()
     
-    details = get_artist_details(artist['id'])
-    if details:
-        artists_details.append(details)
+    print("JEK2 RECORDS - TALENT SCOUTING SPOTIFY V2")
+    print("Recherche ciblée d'artistes émergents (< 50K followers)")
+    print("=" * 70)
     
-    time.sleep(0.3)
-
-print(f"\n{len(artists_details)} artistes émergents validés après filtrage")
-
-if len(artists_details) == 0:
-    print("\nAucun artiste ne correspond aux critères stricts.")
-    print("Suggestions:")
-    print("  - Élargir la fourchette de popularité")
-    print("  - Élargir la fourchette de followers")
-    print("  - Augmenter le délai de sortie récente")
-    exit()
-
-print("\nETAPE 3: Calcul du score de potentiel...")
-for artist in artists_details:
-    artist['score_potentiel'] = calculate_potential_score(artist)
-
-artists_details.sort(key=lambda x: x['score_potentiel'], reverse=True)
-
-df = pd.DataFrame(artists_details)
-
-column_order = [
-    'nom', 'followers', 'popularite', 'avg_track_popularity', 
-    'growth_indicator', 'score_potentiel', 'last_release_date',
-    'genres', 'url_spotify', 'date_extraction'
-]
-df = df[column_order]
-
-filename = f'../data/spotify_emerging_artists_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-df.to_csv(filename, index=False, encoding='utf-8-sig')
-
-print(f"\nDonnées exportées dans: {filename}")
-print(f"\n{len(df)} ARTISTES ÉMERGENTS TROUVÉS (classés par potentiel)")
-print("=" * 80)
+    artists_list = discover(state)
+    print(f"\n{len(artists_list)} artistes candidats trouvés")
+    
+    print("\nETAPE 2: Analyse détaillée et filtrage strict...")
+    print("Cela peut prendre plusieurs minutes...")
+    print("   Filtres actifs:")
+    print(f"   • Popularité: {MIN_POPULARITY}-{MAX_POPULARITY}")
+    print(f"   • Followers: {MIN_FOLLOWERS:,}-{MAX_FOLLOWERS:,}")
+    print(f"   • Activité récente: < {MIN_RECENT_RELEASE_MONTHS} mois")
+    print()
+    
+    processed_ids = set(state['processed']) if state else set()
+    validated_count = state['validated'] if state else 0
+    rejected_count = {
+        'popularity': 0,
+        'followers': 0,
+        'no_recent_release': 0,
+        'other': 0,
+        'throttled': 0
+    }
+    throttled_ids = state['throttled_ids'] if state else []
+    hydration_filter = build_hydration_filter()
+    
+    if state:
+        rejected_count.update(state['rejected'])
+        hydration_filter.restore(state['hydration_filter'])
+        fmt = state['format']
+        db_platform = state.get('db_platform')
+    else:
+        db_platform = 'Spotify' if db else None
+    
+    # Les artistes validés sont écrits au fil de l'eau (score compris)
+    if state:
+        sink = open_sink(state['output'], fmt, OUTPUT_COLUMNS, marker=state['marker'], db_platform=db_platform)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = output_path('spotify_emerging_artists', fmt, timestamp) if file else None
+        sink = open_sink(path, fmt, OUTPUT_COLUMNS, db_platform=db_platform)
+    
+    if processed_ids:
+        print(f"  {len(processed_ids)} artistes déjà analysés, {validated_count} validés")
+    
+    to_process = [artist['id'] for artist in artists_list[:MAX_CANDIDATES] if artist['id'] not in processed_ids]
+    
+    pool = ThreadPoolExecutor(max_workers=ENRICH_WORKERS)
+    
+    try:
+        for start in range(0, len(to_process), HYDRATION_BATCH_SIZE):
+            batch_ids = to_process[start:start + HYDRATION_BATCH_SIZE]
+            lost_ids = []
+            
+            # 1 requête pour 50 artistes ; seuls les survivants sont enrichis (en parallèle)
+            survivors = hydrate_artists(batch_ids, hydration_filter, lost_ids)
+            
+            for artist, (details, reason) in zip(survivors, pool.map(enrich_artist, survivors)):
+                if details:
+                    persist(sink, details)
+                    validated_count += 1
+                elif reason == 'throttled':
+                    lost_ids.append(artist['id'])
+                else:
+                    rejected_count[reason] += 1
+            
+            rejected_count['throttled'] += len(lost_ids)
+            throttled_ids.extend(lost_ids)
+            
+            processed_ids.update(batch_ids)
+            print(f"  Progression: {len(processed_ids)}/{min(MAX_CANDIDATES, len(artists_list))} | Validés: {validated_count}")
+            
+            # commit() d'abord : le fichier contient tout ce que le checkpoint déclare
+            checkpoint.maybe_save(lambda: {
+                'candidates': artists_list,
+                'processed': list(processed_ids),
+                'output': sink.path,
+                'format': fmt,
+                'db_platform': db_platform,
+                'marker': sink.commit(),
+                'validated': validated_count,
+                'rejected': rejected_count,
+                'hydration_filter': hydration_filter.state(),
+                'throttled_ids': throttled_ids,
+            })
+    except BaseException:
+        # Interruption : seul ce que déclare le dernier checkpoint est conservé
+        sink.abort()
+        raise
+    finally:
+        pool.shutdown()
+    sink.close()
+    
+    rejected_count.update(hydration_filter.rejected)
+    
+    print(f"\n{validated_count} artistes émergents validés après filtrage")
+    print(f"  Rejetés: popularité {rejected_count['popularity']} | followers {rejected_count['followers']} "
+          f"| pas de sortie récente {rejected_count['no_recent_release']} | autres {rejected_count['other']}")
+    # Pas des rejets : ces artistes n'ont pas pu être évalués (quota Spotify)
+    print(f"  Perdus (throttling): {rejected_count['throttled']} | "
+          f"{backoff.stats['throttled']} réponses 429, {backoff.stats['retries']} nouvelles tentatives")
+    if throttled_ids:
+        print(f"    IDs: {', '.join(throttled_ids[:20])}{' ...' if len(throttled_ids) > 20 else ''}")
+    hydration_filter.print_report({'popularity': 'Popularité hors limite', 'followers': 'Followers hors limite'})
+    checkpoint.clear()
+    
+    summary = {
+        'output': sink.path,
+        'validated': validated_count,
+        'rejected': rejected_count,
+        'throttled_ids': throttled_ids,
+    }
+    
+    if validated_count == 0:
+        print("\nAucun artiste ne correspond aux critères stricts.")
+        print("Suggestions:")
+        print("  - Élargir la fourchette de popularité")
+        print("  - Élargir la fourchette de followers")
+        print("  - Augmenter le délai de sortie récente")
+        return summary
+    
+    if db_platform:
+        print(f"\n{validated_count} artistes écrits dans PostgreSQL")
+    
+    if not sink.path:
+        return summary
+    
+    print(f"\nDonnées exportées dans: {sink.path}")
+    
+    if report:
+        # Classement + rapport : passe séparée sur la sortie
+        print_spotify_report(sink.path)
+    
+    return summary
 
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-pd.set_option('display.width', None)
-pd.set_option('display.max_colwidth', 40)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scraper Spotify - artistes émergents")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprendre depuis le dernier checkpoint s'il existe")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Format de sortie des artistes validés (défaut: %(default)s)")
+    parser.add_argument('--db', action='store_true',
+                        help="Écrire aussi directement dans PostgreSQL (DATABASE_URL)")
+    parser.add_argument('--no-file', action='store_true',
+                        help="Pas de fichier de sortie (avec --db uniquement)")
+    args = parser.parse_args(argv)
+    if args.no_file and not args.db:
+        parser.error("--no-file n'a de sens qu'avec --db")
+    return args
 
-print(df.to_string(index=False))
+def main(argv=None):
+    args = parse_args(argv)
+    run_collection(resume=args.resume, fmt=args.format, db=args.db, file=not args.no_file)
 
-print("\n" + "=" * 80)
-print("STATISTIQUES:")
-print(f"  • Total d'artistes émergents: {len(df)}")
-print(f"  • Moyenne followers: {df['followers'].mean():.0f}")
-print(f"  • Médiane followers: {df['followers'].median():.0f}")
-print(f"  • Moyenne popularité: {df['popularite'].mean():.1f}")
-print(f"  • Score potentiel moyen: {df['score_potentiel'].mean():.1f}")
-print(f"  • Meilleur score: {df['score_potentiel'].max():.1f}")
-print(f"  • Score le plus bas: {df['score_potentiel'].min():.1f}")
-print(f"\nTop 3 artistes les plus prometteurs:")
-for i, row in df.head(3).iterrows():
-    print(f"   {i+1}. {row['nom']} - Score: {row['score_potentiel']} | {row['followers']:,} followers")
\ No newline at end of file
+if __name__ == "__main__":
+    main()